@@ -0,0 +1,106 @@
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from pipeline.etl.http_client import ResilientClient, ExtractError
+
+
+# Local stub of the crypto API that injects slow responses, stalls and 5xx errors
+class FaultInjectingHandler(BaseHTTPRequestHandler):
+    slow_rate = 0.05
+    slow_seconds = 1.0
+    stall_rate = 0.01
+    stall_seconds = 10.0
+    error_rate = 0.05
+    base_seconds = 0.005
+
+    def do_GET(self):
+        roll = random.random()
+        if roll < self.error_rate:
+            self.send_response(503)
+            self.end_headers()
+            return
+        roll -= self.error_rate
+        if roll < self.stall_rate:
+            time.sleep(self.stall_seconds)
+        elif roll < self.stall_rate + self.slow_rate:
+            time.sleep(self.slow_seconds)
+        else:
+            time.sleep(random.expovariate(1 / self.base_seconds))
+
+        body = json.dumps({'success': True, 'target': 'USD', 'date': '2018-04-30',
+                           'rates': {'BTC': 9240.55, 'ETH': 669.58}}).encode()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client timed out or a hedged twin already won
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FaultInjectingHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+# Timing end-to-end calls (including retries) and counting the ones that did not return data
+def run(name, get, url, requests_count):
+    latencies = []
+    failures = 0
+    for _ in range(requests_count):
+        start = time.perf_counter()
+        try:
+            response = get(url)
+            if response.status_code != 200:
+                failures += 1
+        except (requests.RequestException, ExtractError):
+            failures += 1
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    ordered = sorted(latencies)
+    print(f"{name:<28} p50={percentile(ordered, 50):8.1f} ms  p95={percentile(ordered, 95):8.1f} ms  "
+          f"p99={percentile(ordered, 99):8.1f} ms  max={ordered[-1]:8.1f} ms  failures={failures}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tail latency of the extract client against a fault-injecting stub")
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--read-timeout', type=float, default=2.0)
+    parser.add_argument('--hedge-percentile', type=float, default=95.0)
+    args = parser.parse_args()
+
+    server = start_stub_server()
+    url = f"http://127.0.0.1:{server.server_address[1]}/live"
+
+    try:
+        # Baseline: what fetch_data_from_api used to do (no timeout, no retries)
+        run('plain requests.get', requests.get, url, args.requests)
+
+        retrying = ResilientClient(read_timeout=args.read_timeout, backoff_base=0.05,
+                                   failure_threshold=args.requests)
+        run('timeouts + backoff', retrying.get, url, args.requests)
+
+        hedged = ResilientClient(read_timeout=args.read_timeout, backoff_base=0.05,
+                                 failure_threshold=args.requests, hedge_percentile=args.hedge_percentile)
+        run(f'+ hedged at p{args.hedge_percentile:g}', hedged.get, url, args.requests)
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
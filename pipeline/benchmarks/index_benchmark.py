@@ -0,0 +1,194 @@
+import math
+import time
+import random
+import argparse
+import statistics
+from datetime import date, timedelta
+from psycopg2.extras import execute_values
+from pipeline.etl.db import get_connection, close_pool
+
+
+# Scratch schema holding both copies of the stock table; dropped when the benchmark ends
+BENCHMARK_SCHEMA = 'index_benchmark'
+
+STOCK_COLUMNS = """
+    date DATE NOT NULL,
+    symbol_id SMALLINT NOT NULL,
+    adj_close DOUBLE PRECISION,
+    close_price DOUBLE PRECISION,
+    maximum_value DOUBLE PRECISION,
+    minimum_value DOUBLE PRECISION,
+    opening_price DOUBLE PRECISION,
+    traded_volume BIGINT
+"""
+
+# "before" is the table as it was created by hand (no keys, no indexes);
+# "after" carries the primary key and BRIN index from pipeline/etl/schema.py
+VARIANTS = {
+    'before': f"CREATE TABLE {BENCHMARK_SCHEMA}.before ({STOCK_COLUMNS});",
+    'after': f"""
+        CREATE TABLE {BENCHMARK_SCHEMA}.after ({STOCK_COLUMNS}, PRIMARY KEY (symbol_id, date));
+        CREATE INDEX after_date_brin ON {BENCHMARK_SCHEMA}.after USING BRIN (date)
+            WITH (pages_per_range = 32, autosummarize = on);
+    """,
+}
+
+BRIN_INDEX = f"{BENCHMARK_SCHEMA}.after_date_brin"
+
+# Query shapes used by query.py and aggregates.py
+QUERIES = {
+    'latest price per symbol': """
+        SELECT * FROM {table} WHERE symbol_id = %(symbol_id)s ORDER BY date DESC LIMIT 1
+    """,
+    'last 30 rows per symbol': """
+        SELECT * FROM {table} WHERE symbol_id = %(symbol_id)s ORDER BY date DESC LIMIT 30
+    """,
+    'one-month range scan': """
+        SELECT count(*), avg(adj_close) FROM {table} WHERE date BETWEEN %(start)s AND %(end)s
+    """,
+    'previous close for one date': """
+        SELECT count(*), avg(s.adj_close / NULLIF(prev.adj_close, 0) - 1)
+        FROM {table} s
+        CROSS JOIN LATERAL (
+            SELECT p.adj_close FROM {table} p
+            WHERE p.symbol_id = s.symbol_id AND p.date < s.date
+            ORDER BY p.date DESC LIMIT 1
+        ) prev
+        WHERE s.date = %(day)s
+    """,
+}
+
+
+def trading_days(start, count):
+    days = []
+    current = start
+    while len(days) < count:
+        if current.weekday() < 5:
+            days.append(current)
+        current += timedelta(days=1)
+    return days
+
+
+# Synthetic prices in load order (one trading day after the other, all symbols per day)
+def synthetic_rows(days, symbols):
+    return [
+        (day, symbol_id, *[random.uniform(10, 500) for _ in range(5)], random.randint(10 ** 5, 10 ** 7))
+        for day in days
+        for symbol_id in range(1, symbols + 1)
+    ]
+
+
+# One random symbol, month and day per query execution; each query uses the keys it needs
+def random_params(history, symbols):
+    month_start = random.choice(history[:-21])
+    return {
+        'symbol_id': random.randint(1, symbols),
+        'start': month_start,
+        'end': month_start + timedelta(days=30),
+        'day': random.choice(history[1:]),
+    }
+
+
+def summarize(name, latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[math.ceil(len(ordered) * 0.95) - 1]
+    print(f"  {name:<30} mean={statistics.mean(ordered):9.3f} ms  "
+          f"p50={statistics.median(ordered):9.3f} ms  p95={p95:9.3f} ms  (n={len(ordered)})")
+
+
+# Stops early once max_seconds are spent, so unindexed plans do not stall the run
+def time_query(cursor_object, sql, params_factory, iterations, max_seconds):
+    latencies = []
+    deadline = time.perf_counter() + max_seconds
+    for _ in range(iterations):
+        if latencies and time.perf_counter() > deadline:
+            break
+        params = params_factory()
+        start = time.perf_counter()
+        cursor_object.execute(sql, params)
+        cursor_object.fetchall()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+# Inserting rows the way load.py does, including the BRIN summary after the insert
+def insert_rows(cursor_object, variant, rows, page_size):
+    execute_values(cursor_object, f"INSERT INTO {BENCHMARK_SCHEMA}.{variant} VALUES %s", rows, page_size=page_size)
+    if variant == 'after':
+        cursor_object.execute("SELECT brin_summarize_new_values(%s::regclass);", (BRIN_INDEX,))
+
+
+def relation_size_mb(cursor_object, relation):
+    cursor_object.execute("SELECT pg_relation_size(%s::regclass);", (relation,))
+    return cursor_object.fetchone()[0] / 1024 / 1024
+
+
+# Loading the same synthetic history into both variants and timing the load and the read paths
+def main():
+    parser = argparse.ArgumentParser(description="Before/after benchmark of the stock table keys and indexes")
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--days', type=int, default=1000)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--max-seconds', type=float, default=20.0, help="Time budget per query and variant")
+    parser.add_argument('--page-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    random.seed(42)
+    days = trading_days(date(2015, 1, 1), args.days + 1)
+    history, next_day = days[:-1], days[-1]
+    rows = synthetic_rows(history, args.symbols)
+    append_rows = synthetic_rows([next_day], args.symbols)
+    print(f"{len(rows)} rows: {args.symbols} symbols x {args.days} trading days")
+
+    try:
+        with get_connection() as connection:
+            cursor_object = connection.cursor()
+            cursor_object.execute(f"DROP SCHEMA IF EXISTS {BENCHMARK_SCHEMA} CASCADE; CREATE SCHEMA {BENCHMARK_SCHEMA};")
+            connection.commit()
+
+            for variant, ddl in VARIANTS.items():
+                table = f"{BENCHMARK_SCHEMA}.{variant}"
+                cursor_object.execute(ddl)
+                connection.commit()
+
+                print(f"{variant}:")
+                start = time.perf_counter()
+                insert_rows(cursor_object, variant, rows, args.page_size)
+                connection.commit()
+                print(f"  {'full history load':<30} {time.perf_counter() - start:9.2f} s")
+
+                # Appending one more trading day, as the daily load does; rolled back afterwards
+                start = time.perf_counter()
+                insert_rows(cursor_object, variant, append_rows, args.page_size)
+                print(f"  {'one-day append':<30} {(time.perf_counter() - start) * 1000:9.3f} ms")
+                connection.rollback()
+
+                cursor_object.execute(f"ANALYZE {table};")
+                connection.commit()
+
+                for name, sql in QUERIES.items():
+                    latencies = time_query(cursor_object, sql.format(table=table),
+                                           lambda: random_params(history, args.symbols),
+                                           args.iterations, args.max_seconds)
+                    summarize(name, latencies)
+
+                print(f"  {'table size':<30} {relation_size_mb(cursor_object, table):9.1f} MB")
+                if variant == 'after':
+                    print(f"  {'primary key size':<30} {relation_size_mb(cursor_object, f'{table}_pkey'):9.1f} MB")
+                    print(f"  {'BRIN (date) size':<30} {relation_size_mb(cursor_object, BRIN_INDEX):9.3f} MB")
+                    # Size of the btree that BRIN replaces, for comparison
+                    cursor_object.execute(f"CREATE INDEX after_date_btree ON {table} (date);")
+                    print(f"  {'btree (date) size, not kept':<30} "
+                          f"{relation_size_mb(cursor_object, f'{BENCHMARK_SCHEMA}.after_date_btree'):9.1f} MB")
+                    connection.rollback()
+                connection.commit()
+
+            cursor_object.execute(f"DROP SCHEMA {BENCHMARK_SCHEMA} CASCADE;")
+            connection.commit()
+            cursor_object.close()
+    finally:
+        close_pool()
+
+
+if __name__ == '__main__':
+    main()
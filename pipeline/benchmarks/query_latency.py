@@ -0,0 +1,54 @@
+import time
+import argparse
+import statistics
+from pipeline.etl.db import close_pool
+from pipeline.etl.query import (
+    get_latest_stock_price,
+    get_stock_history,
+    get_latest_crypto_rate
+)
+
+
+# Timing repeated calls of a lookup and returning latencies in milliseconds
+def time_calls(func, args, iterations, use_cache):
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func(*args, use_cache=use_cache)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarize(name, latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(f"{name:<40} mean={statistics.mean(ordered):8.3f} ms  "
+          f"p50={statistics.median(ordered):8.3f} ms  p95={p95:8.3f} ms")
+
+
+# Comparing uncached (prepared statement round trip) and cached latest-price lookups
+def main():
+    parser = argparse.ArgumentParser(description="Latency benchmark for the read-side query API")
+    parser.add_argument('--symbol', default='AAPL')
+    parser.add_argument('--currency', default='rates.BTC')
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    lookups = [
+        ('latest_stock_price', get_latest_stock_price, (args.symbol,)),
+        ('stock_history(30)', get_stock_history, (args.symbol, 30)),
+        ('latest_crypto_rate', get_latest_crypto_rate, (args.currency,)),
+    ]
+
+    try:
+        for name, func, func_args in lookups:
+            # Warm up the pool and the prepared statement before timing
+            func(*func_args, use_cache=False)
+            summarize(f"{name} uncached", time_calls(func, func_args, args.iterations, use_cache=False))
+            summarize(f"{name} cached", time_calls(func, func_args, args.iterations, use_cache=True))
+    finally:
+        close_pool()
+
+
+if __name__ == '__main__':
+    main()
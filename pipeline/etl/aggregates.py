@@ -0,0 +1,146 @@
+import os
+import logging
+from dotenv import load_dotenv
+from pipeline.etl.db import get_connection
+
+load_dotenv()
+
+
+# Setting up logging
+logger = logging.getLogger(__name__)
+
+
+# Setting up logging to log in the logs/ directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+log_file_path = os.path.join(current_dir, 'logs', 'code_log.txt')
+
+
+logging.basicConfig(
+    filename=log_file_path,  # Save the log file in logs/ directory
+    encoding='utf-8',
+    level=logging.DEBUG,
+    format='%(asctime)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+
+def log_progress(message):
+    logger.debug(message)
+
+
+# Aggregate tables owned by the pipeline (created by the schema migrations in schema.py)
+AGGREGATE_TABLES_DDL = """
+CREATE TABLE IF NOT EXISTS sector_daily_return (
+    date DATE NOT NULL,
+    sector TEXT NOT NULL,
+    symbol_count INTEGER NOT NULL,
+    avg_return DOUBLE PRECISION,
+    weighted_return DOUBLE PRECISION,
+    sector_weight DOUBLE PRECISION,
+    index_contribution DOUBLE PRECISION,
+    PRIMARY KEY (date, sector)
+);
+
+CREATE TABLE IF NOT EXISTS index_daily_return (
+    date DATE PRIMARY KEY,
+    symbol_count INTEGER NOT NULL,
+    weighted_return DOUBLE PRECISION
+);
+"""
+
+# A loaded date also changes the return of the next trading date, so the stored date following each run
+# of loaded dates is refreshed as well. Successors come from one pass over the distinct stored dates from
+# the first loaded date on (the BRIN index on date keeps this to the recent page ranges for daily loads)
+AFFECTED_DATES_QUERY = """
+WITH loaded AS (
+    SELECT unnest(%(dates)s::date[]) AS date
+),
+stored AS (
+    SELECT date, lead(date) OVER (ORDER BY date) AS next_date
+    FROM (SELECT DISTINCT date FROM sp500_stock_table WHERE date >= %(first_date)s::date) d
+)
+SELECT date FROM loaded
+UNION
+SELECT s.next_date
+FROM stored s
+JOIN loaded l ON l.date = s.date
+WHERE s.next_date IS NOT NULL;
+"""
+
+DELETE_SECTOR_QUERY = "DELETE FROM sector_daily_return WHERE date = ANY(%(dates)s::date[]);"
+
+DELETE_INDEX_QUERY = "DELETE FROM index_daily_return WHERE date = ANY(%(dates)s::date[]);"
+
+# Daily return per stock against its previous trading day, rolled up per sector and weighted by index weight
+INSERT_SECTOR_QUERY = """
+INSERT INTO sector_daily_return (date, sector, symbol_count, avg_return, weighted_return,
+                                 sector_weight, index_contribution)
+SELECT r.date,
+       r.sector,
+       count(*),
+       avg(r.daily_return),
+       sum(r.weight * r.daily_return) / NULLIF(sum(r.weight), 0),
+       sum(r.weight),
+       sum(r.weight * r.daily_return)
+FROM (
+    SELECT s.date, sec.name AS sector, c.weight,
+           s.adj_close / NULLIF(prev.adj_close, 0) - 1 AS daily_return
+    FROM sp500_stock_table s
+    JOIN sp500_company c ON c.symbol_id = s.symbol_id
+    JOIN sector_lookup sec ON sec.sector_id = c.sector_id
+    CROSS JOIN LATERAL (
+        SELECT p.adj_close
+        FROM sp500_stock_table p
+        WHERE p.symbol_id = s.symbol_id AND p.date < s.date
+        ORDER BY p.date DESC
+        LIMIT 1
+    ) prev
+    WHERE s.date = ANY(%(dates)s::date[])
+) r
+WHERE r.daily_return IS NOT NULL
+GROUP BY r.date, r.sector;
+"""
+
+INSERT_INDEX_QUERY = """
+INSERT INTO index_daily_return (date, symbol_count, weighted_return)
+SELECT date, sum(symbol_count), sum(index_contribution)
+FROM sector_daily_return
+WHERE date = ANY(%(dates)s::date[])
+GROUP BY date;
+"""
+
+
+# Recomputing the aggregates for the given dates inside the caller's transaction
+def refresh_aggregates(cursor_object, dates):
+    dates = sorted({str(loaded_date)[:10] for loaded_date in dates})
+    if not dates:
+        return []
+
+    cursor_object.execute(AFFECTED_DATES_QUERY, {'dates': dates, 'first_date': dates[0]})
+    affected_dates = sorted(row[0] for row in cursor_object.fetchall())
+
+    params = {'dates': affected_dates}
+    cursor_object.execute(DELETE_INDEX_QUERY, params)
+    cursor_object.execute(DELETE_SECTOR_QUERY, params)
+    cursor_object.execute(INSERT_SECTOR_QUERY, params)
+    cursor_object.execute(INSERT_INDEX_QUERY, params)
+
+    log_progress(f"Aggregates refreshed for {len(affected_dates)} date(s)")
+    return affected_dates
+
+
+# Rebuilding the aggregates for every loaded date (e.g. after sp500_company weights changed)
+def rebuild_aggregates():
+    try:
+        with get_connection() as connection:
+            cursor_object = connection.cursor()
+            cursor_object.execute("SELECT DISTINCT date FROM sp500_stock_table;")
+            all_dates = [row[0] for row in cursor_object.fetchall()]
+            refresh_aggregates(cursor_object, all_dates)
+            connection.commit()
+            cursor_object.close()
+
+        log_progress("Aggregates were rebuilt without any problem")
+
+    except Exception as e:
+        log_progress(f"Exception in rebuilding aggregates: {e}")
@@ -0,0 +1,127 @@
+import os
+import logging
+import threading
+from dotenv import load_dotenv
+from psycopg2.extras import execute_values
+from pipeline.etl.dimensions import column_exists
+from pipeline.etl.ticker_matcher import TickerMatcher
+
+load_dotenv()
+
+
+# Setting up logging
+logger = logging.getLogger(__name__)
+
+
+# Setting up logging to log in the logs/ directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+log_file_path = os.path.join(current_dir, 'logs', 'code_log.txt')
+
+
+logging.basicConfig(
+    filename=log_file_path,  # Save the log file in logs/ directory
+    encoding='utf-8',
+    level=logging.DEBUG,
+    format='%(asctime)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+
+def log_progress(message):
+    logger.debug(message)
+
+
+# Text search configuration used for both indexing and querying
+TEXT_SEARCH_CONFIG = 'english'
+
+# articles_table gets an id, a tsvector with a GIN index and a link index for the "is it new?" check;
+# article_ticker joins articles to symbol_lookup
+ARTICLE_TABLES_DDL = """
+CREATE TABLE IF NOT EXISTS articles_table (
+    title TEXT,
+    link TEXT
+);
+
+ALTER TABLE articles_table ADD COLUMN IF NOT EXISTS article_id BIGSERIAL;
+ALTER TABLE articles_table ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+
+CREATE UNIQUE INDEX IF NOT EXISTS articles_table_article_id_idx ON articles_table (article_id);
+CREATE INDEX IF NOT EXISTS articles_table_link_idx ON articles_table (link);
+CREATE INDEX IF NOT EXISTS articles_table_search_idx ON articles_table USING GIN (search_vector);
+
+CREATE TABLE IF NOT EXISTS article_ticker (
+    article_id BIGINT NOT NULL,
+    symbol_id SMALLINT NOT NULL REFERENCES symbol_lookup (symbol_id),
+    PRIMARY KEY (article_id, symbol_id)
+);
+
+CREATE INDEX IF NOT EXISTS article_ticker_symbol_idx ON article_ticker (symbol_id, article_id);
+"""
+
+# Rows stored before the search column existed are vectorised once, when the column is added
+BACKFILL_SEARCH_VECTOR = f"""
+UPDATE articles_table SET search_vector = to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(title, ''))
+WHERE search_vector IS NULL;
+"""
+
+# Only links not stored yet are inserted; their tsvector is computed in the same statement
+INSERT_NEW_ARTICLES = f"""
+INSERT INTO articles_table (title, link, search_vector)
+SELECT v.title, v.link, to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(v.title, ''))
+FROM (VALUES %s) AS v(title, link)
+WHERE NOT EXISTS (SELECT 1 FROM articles_table a WHERE a.link = v.link)
+RETURNING article_id, title;
+"""
+
+
+def ensure_article_schema(cursor_object):
+    had_search_vector = column_exists(cursor_object, 'articles_table', 'search_vector')
+    cursor_object.execute(ARTICLE_TABLES_DDL)
+    if not had_search_vector:
+        cursor_object.execute(BACKFILL_SEARCH_VECTOR)
+        log_progress(f"search_vector was filled for {cursor_object.rowcount} existing article(s)")
+
+
+# The automaton is built once per process and rebuilt only when the company set changes
+_matcher = None
+_matcher_fingerprint = None
+_matcher_lock = threading.Lock()
+
+
+def get_ticker_matcher(cursor_object):
+    global _matcher, _matcher_fingerprint
+    cursor_object.execute("SELECT count(*), max(symbol_id) FROM sp500_company;")
+    fingerprint = cursor_object.fetchone()
+
+    with _matcher_lock:
+        if _matcher is None or fingerprint != _matcher_fingerprint:
+            cursor_object.execute("""
+                SELECT sym.name, c.short_name, c.symbol_id
+                FROM sp500_company c
+                JOIN symbol_lookup sym ON sym.symbol_id = c.symbol_id;
+            """)
+            _matcher = TickerMatcher.from_companies(cursor_object.fetchall())
+            _matcher_fingerprint = fingerprint
+            log_progress(f"Ticker automaton was built for {fingerprint[0]} companies")
+        return _matcher
+
+
+# Inserting new articles and their ticker mentions; returns (new articles, ticker links)
+def insert_new_articles(cursor_object, rows, page_size=1000):
+    new_articles = execute_values(cursor_object, INSERT_NEW_ARTICLES, rows, page_size=page_size, fetch=True)
+    if not new_articles:
+        return 0, 0
+
+    matcher = get_ticker_matcher(cursor_object)
+    mentions = [
+        (article_id, symbol_id)
+        for article_id, title in new_articles
+        for symbol_id in matcher.find(title)
+    ]
+    if mentions:
+        execute_values(cursor_object, """
+            INSERT INTO article_ticker (article_id, symbol_id) VALUES %s
+            ON CONFLICT DO NOTHING;
+        """, mentions, page_size=page_size)
+
+    return len(new_articles), len(mentions)
@@ -0,0 +1,179 @@
+import os
+import logging
+import argparse
+from datetime import date, timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from dotenv import load_dotenv
+from pipeline.etl.db import get_connection
+from pipeline.etl.schema import ensure_schema
+from pipeline.etl.landing import get_landing_dir, partition_exists, to_partition_key
+from pipeline.etl.extract import fetch_data_from_api
+from pipeline.etl.transform import process_crypto_data
+from pipeline.etl.load import insert_crypto
+
+load_dotenv()
+
+
+# Setting up logging
+logger = logging.getLogger(__name__)
+
+
+# Setting up logging to log in the logs/ directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+log_file_path = os.path.join(current_dir, 'logs', 'code_log.txt')
+
+
+logging.basicConfig(
+    filename=log_file_path,  # Save the log file in logs/ directory
+    encoding='utf-8',
+    level=logging.DEBUG,
+    format='%(asctime)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+
+def log_progress(message):
+    logger.debug(message)
+
+
+# A fetched date is one whose landing partition exists; a loaded date is one with rows in crypto_table.
+# Shards write their transformed output under the landing zone, so on Airflow LANDING_DATA_DIR must be
+# storage shared by all workers (the merge task may run on a different one)
+SHARD_OUTPUT_DIR = '_backfill_shards'
+
+
+def date_range(start_date, end_date):
+    start = date.fromisoformat(to_partition_key(start_date))
+    end = date.fromisoformat(to_partition_key(end_date))
+    return [(start + timedelta(days=offset)).isoformat() for offset in range((end - start).days + 1)]
+
+
+# Splitting dates into at most shard_count contiguous, similarly sized shards
+def split_shards(dates, shard_count):
+    shard_count = max(1, min(shard_count, len(dates)))
+    size, remainder = divmod(len(dates), shard_count)
+    shards = []
+    start = 0
+    for index in range(shard_count):
+        end = start + size + (1 if index < remainder else 0)
+        if end > start:
+            shards.append(dates[start:end])
+        start = end
+    return shards
+
+
+# Historical endpoint for one date, e.g. CRYPTO_HISTORICAL_ENDPOINT=http://api.coinlayer.com/{date}?access_key=...
+def historical_endpoint(backfill_date):
+    template = os.getenv("CRYPTO_HISTORICAL_ENDPOINT")
+    if not template or '{date}' not in template:
+        raise ValueError("CRYPTO_HISTORICAL_ENDPOINT must be set and contain a {date} placeholder")
+    return template.format(date=backfill_date)
+
+
+# Dates of [start_date, end_date] that already have rows in crypto_table. Each shard merge is loaded
+# in one transaction, so a date with any row is complete
+def read_loaded_dates(start_date, end_date):
+    ensure_schema()
+    with get_connection() as connection:
+        cursor_object = connection.cursor()
+        cursor_object.execute("SELECT DISTINCT date FROM crypto_table WHERE date BETWEEN %s AND %s;",
+                              (to_partition_key(start_date), to_partition_key(end_date)))
+        loaded = {row[0].isoformat() for row in cursor_object.fetchall()}
+        connection.commit()
+        cursor_object.close()
+    return loaded
+
+
+# Splitting the not-yet-loaded dates of [start_date, end_date] into shards
+def plan_shards(start_date, end_date, shard_count):
+    loaded = read_loaded_dates(start_date, end_date)
+    pending = [backfill_date for backfill_date in date_range(start_date, end_date) if backfill_date not in loaded]
+    log_progress(f"Backfill {start_date}..{end_date}: {len(pending)} date(s) pending, {len(loaded)} already loaded")
+    return split_shards(pending, int(shard_count)) if pending else []
+
+
+# Fetching the missing partitions of one shard and transforming the shard; returns the transformed file path
+def fetch_and_transform_shard(shard_dates, landing_dir=None):
+    landing_dir = get_landing_dir(landing_dir)
+    for backfill_date in shard_dates:
+        if partition_exists('crypto', backfill_date, landing_dir):
+            continue
+        fetch_data_from_api(historical_endpoint(backfill_date), landing_dir, backfill_date)
+
+    shard_df = process_crypto_data(landing_dir, shard_dates[0], shard_dates[-1])
+    if shard_df.empty:
+        raise ValueError(f"Transforming crypto shard {shard_dates[0]}..{shard_dates[-1]} produced no rows")
+
+    output_dir = os.path.join(landing_dir, SHARD_OUTPUT_DIR)
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"crypto_{shard_dates[0]}_{shard_dates[-1]}.parquet")
+    shard_df.to_parquet(output_path, engine='pyarrow', compression='zstd', index=False)
+    log_progress(f"Backfill shard {shard_dates[0]}..{shard_dates[-1]} was transformed into {output_path}")
+    return output_path
+
+
+# Merging the transformed shards into a single bulk load of crypto_table
+def merge_and_load(shard_paths):
+    shard_paths = [path for path in shard_paths if path]
+    if not shard_paths:
+        log_progress("Backfill has nothing to load")
+        return 0
+
+    missing_paths = [path for path in shard_paths if not os.path.exists(path)]
+    if missing_paths:
+        raise FileNotFoundError(f"Backfill shard output not found: {missing_paths}. "
+                                f"LANDING_DATA_DIR must be shared by all workers")
+
+    merged_df = pd.concat([pd.read_parquet(path, engine='pyarrow') for path in shard_paths], ignore_index=True)
+    loaded_rows = insert_crypto(merged_df)
+    if loaded_rows is None:
+        raise RuntimeError(f"Bulk load of {len(merged_df)} backfilled crypto rows failed")
+
+    for path in shard_paths:
+        os.remove(path)
+
+    log_progress(f"Backfill loaded {loaded_rows} rows into crypto_table")
+    return loaded_rows
+
+
+# Running the whole backfill locally with a bounded process pool
+def run_backfill(start_date, end_date, shard_count=8, max_workers=4, landing_dir=None):
+    landing_dir = get_landing_dir(landing_dir)
+    shards = plan_shards(start_date, end_date, shard_count)
+
+    shard_paths = []
+    failed_shards = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch_and_transform_shard, shard, landing_dir): shard for shard in shards}
+        for future in as_completed(futures):
+            shard = futures[future]
+            try:
+                shard_paths.append(future.result())
+            except Exception as e:
+                failed_shards.append(shard)
+                log_progress(f"Backfill shard {shard[0]}..{shard[-1]} failed: {e}")
+
+    # Load what succeeded; failed dates stay pending and are picked up by the next run
+    loaded_rows = merge_and_load(shard_paths)
+    if failed_shards:
+        failed = ", ".join(f"{shard[0]}..{shard[-1]}" for shard in failed_shards)
+        raise RuntimeError(f"Backfill loaded {loaded_rows} rows but these shards failed: {failed}")
+    return loaded_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill crypto_table from historical API snapshots")
+    parser.add_argument('--start', required=True, help="First date to backfill (YYYY-MM-DD)")
+    parser.add_argument('--end', required=True, help="Last date to backfill (YYYY-MM-DD)")
+    parser.add_argument('--shards', type=int, default=8, help="Number of date shards")
+    parser.add_argument('--workers', type=int, default=4, help="Maximum number of concurrent shard processes")
+    parser.add_argument('--landing-dir', default=None, help="Landing zone root (defaults to LANDING_DATA_DIR)")
+    args = parser.parse_args()
+
+    loaded_rows = run_backfill(args.start, args.end, args.shards, args.workers, args.landing_dir)
+    print(f"Backfill loaded {loaded_rows} rows into crypto_table")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import os
+import logging
+import threading
+from contextlib import contextmanager
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import ThreadedConnectionPool
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# Setting up logging
+logger = logging.getLogger(__name__)
+
+
+# Setting up logging to log in the logs/ directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+log_file_path = os.path.join(current_dir, 'logs', 'code_log.txt')
+
+
+logging.basicConfig(
+    filename=log_file_path,  # Save the log file in logs/ directory
+    encoding='utf-8',
+    level=logging.DEBUG,
+    format='%(asctime)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+
+def log_progress(message):
+    logger.debug(message)
+
+
+# Connection class that remembers which statements were PREPAREd on its server session
+class PipelineConnection(extensions.connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements = set()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Creating the process-wide connection pool on first use
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            _pool = ThreadedConnectionPool(
+                minconn=int(os.getenv("DB_POOL_MIN", 1)),
+                maxconn=int(os.getenv("DB_POOL_MAX", 5)),
+                dbname=os.getenv("DB_NAME"),
+                user=os.getenv("DB_USER"),
+                password=os.getenv("DB_PASSWORD"),
+                host=os.getenv("DB_HOST"),
+                port=os.getenv("DB_PORT"),
+                connection_factory=PipelineConnection
+            )
+            log_progress("Database connection pool created successfully.")
+    return _pool
+
+
+# Borrowing a pooled connection; uncommitted work is rolled back before it is returned
+@contextmanager
+def get_connection():
+    pool = get_pool()
+    connection = pool.getconn()
+    broken = False
+    try:
+        yield connection
+    except psycopg2.InterfaceError:
+        broken = True
+        raise
+    finally:
+        if connection.closed:
+            broken = True
+        elif connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                connection.rollback()
+            except psycopg2.Error:
+                broken = True
+        pool.putconn(connection, close=broken)
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and not _pool.closed:
+            _pool.closeall()
+            log_progress("Database connection pool is closed")
+        _pool = None
@@ -0,0 +1,270 @@
+import os
+import hashlib
+import logging
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# Setting up logging
+logger = logging.getLogger(__name__)
+
+
+# Setting up logging to log in the logs/ directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+log_file_path = os.path.join(current_dir, 'logs', 'code_log.txt')
+
+
+logging.basicConfig(
+    filename=log_file_path,  # Save the log file in logs/ directory
+    encoding='utf-8',
+    level=logging.DEBUG,
+    format='%(asctime)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+
+def log_progress(message):
+    logger.debug(message)
+
+
+# Lookup table -> id column; every lookup table is (<id> SMALLSERIAL, name TEXT UNIQUE)
+LOOKUP_TABLES = {
+    'exchange_lookup': 'exchange_id',
+    'sector_lookup': 'sector_id',
+    'industry_lookup': 'industry_id',
+    'country_lookup': 'country_id',
+    'symbol_lookup': 'symbol_id',
+}
+
+# Compact company dimension: categorical strings become small-integer ids and the long
+# business summary lives in company_summary, rewritten only when its hash changes
+DIMENSION_TABLES_DDL = """
+CREATE TABLE IF NOT EXISTS exchange_lookup (
+    exchange_id SMALLSERIAL PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS sector_lookup (
+    sector_id SMALLSERIAL PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS industry_lookup (
+    industry_id SMALLSERIAL PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS country_lookup (
+    country_id SMALLSERIAL PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS symbol_lookup (
+    symbol_id SMALLSERIAL PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS sp500_company (
+    symbol_id SMALLINT PRIMARY KEY REFERENCES symbol_lookup (symbol_id),
+    exchange_id SMALLINT REFERENCES exchange_lookup (exchange_id),
+    short_name TEXT,
+    long_name TEXT,
+    sector_id SMALLINT REFERENCES sector_lookup (sector_id),
+    industry_id SMALLINT REFERENCES industry_lookup (industry_id),
+    current_stock_price DOUBLE PRECISION,
+    current_marketcap DOUBLE PRECISION,
+    ebitda DOUBLE PRECISION,
+    revenue_growth DOUBLE PRECISION,
+    city TEXT,
+    state TEXT,
+    country_id SMALLINT REFERENCES country_lookup (country_id),
+    full_time_emp INTEGER,
+    weight DOUBLE PRECISION
+);
+
+CREATE TABLE IF NOT EXISTS company_summary (
+    symbol_id SMALLINT PRIMARY KEY REFERENCES symbol_lookup (symbol_id),
+    summary_hash TEXT NOT NULL,
+    business_summary TEXT
+);
+
+CREATE TABLE IF NOT EXISTS sp500_stock_table (
+    date DATE NOT NULL,
+    symbol_id SMALLINT NOT NULL REFERENCES symbol_lookup (symbol_id),
+    adj_close DOUBLE PRECISION,
+    close_price DOUBLE PRECISION,
+    maximum_value DOUBLE PRECISION,
+    minimum_value DOUBLE PRECISION,
+    opening_price DOUBLE PRECISION,
+    traded_volume BIGINT
+);
+
+CREATE OR REPLACE VIEW sp500_company_view AS
+SELECT sym.name AS symbol, ex.name AS exchange, c.short_name, c.long_name, sec.name AS sector,
+       ind.name AS industry, c.current_stock_price, c.current_marketcap, c.ebitda, c.revenue_growth,
+       c.city, c.state, cty.name AS country, c.full_time_emp, c.weight
+FROM sp500_company c
+JOIN symbol_lookup sym ON sym.symbol_id = c.symbol_id
+LEFT JOIN exchange_lookup ex ON ex.exchange_id = c.exchange_id
+LEFT JOIN sector_lookup sec ON sec.sector_id = c.sector_id
+LEFT JOIN industry_lookup ind ON ind.industry_id = c.industry_id
+LEFT JOIN country_lookup cty ON cty.country_id = c.country_id;
+"""
+
+# Tables created by earlier releases stored the strings inline; they are rewritten in place once
+MIGRATE_LEGACY_COMPANY = """
+INSERT INTO symbol_lookup (name) SELECT DISTINCT symbol FROM sp500_company_legacy
+WHERE symbol IS NOT NULL ON CONFLICT (name) DO NOTHING;
+INSERT INTO exchange_lookup (name) SELECT DISTINCT exchange FROM sp500_company_legacy
+WHERE exchange IS NOT NULL ON CONFLICT (name) DO NOTHING;
+INSERT INTO sector_lookup (name) SELECT DISTINCT sector FROM sp500_company_legacy
+WHERE sector IS NOT NULL ON CONFLICT (name) DO NOTHING;
+INSERT INTO industry_lookup (name) SELECT DISTINCT industry FROM sp500_company_legacy
+WHERE industry IS NOT NULL ON CONFLICT (name) DO NOTHING;
+INSERT INTO country_lookup (name) SELECT DISTINCT country FROM sp500_company_legacy
+WHERE country IS NOT NULL ON CONFLICT (name) DO NOTHING;
+
+INSERT INTO sp500_company (symbol_id, exchange_id, short_name, long_name, sector_id, industry_id,
+                           current_stock_price, current_marketcap, ebitda, revenue_growth,
+                           city, state, country_id, full_time_emp, weight)
+SELECT sym.symbol_id, ex.exchange_id, l.short_name, l.long_name, sec.sector_id, ind.industry_id,
+       l.current_stock_price, l.current_marketcap, l.ebitda, l.revenue_growth,
+       l.city, l.state, cty.country_id, l.full_time_emp, l.weight
+FROM sp500_company_legacy l
+JOIN symbol_lookup sym ON sym.name = l.symbol
+LEFT JOIN exchange_lookup ex ON ex.name = l.exchange
+LEFT JOIN sector_lookup sec ON sec.name = l.sector
+LEFT JOIN industry_lookup ind ON ind.name = l.industry
+LEFT JOIN country_lookup cty ON cty.name = l.country
+ON CONFLICT (symbol_id) DO NOTHING;
+
+INSERT INTO company_summary (symbol_id, summary_hash, business_summary)
+SELECT sym.symbol_id, md5(coalesce(l.business_summary, '')), l.business_summary
+FROM sp500_company_legacy l
+JOIN symbol_lookup sym ON sym.name = l.symbol
+ON CONFLICT (symbol_id) DO NOTHING;
+
+DROP TABLE sp500_company_legacy;
+"""
+
+MIGRATE_LEGACY_STOCK = """
+INSERT INTO symbol_lookup (name) SELECT DISTINCT comp_symbol FROM sp500_stock_table
+WHERE comp_symbol IS NOT NULL ON CONFLICT (name) DO NOTHING;
+
+ALTER TABLE sp500_stock_table ADD COLUMN symbol_id SMALLINT REFERENCES symbol_lookup (symbol_id);
+
+UPDATE sp500_stock_table s SET symbol_id = sym.symbol_id
+FROM symbol_lookup sym WHERE sym.name = s.comp_symbol;
+
+ALTER TABLE sp500_stock_table DROP COLUMN comp_symbol;
+ALTER TABLE sp500_stock_table ALTER COLUMN symbol_id SET NOT NULL;
+"""
+
+# Stock rows with the symbol joined back under its pre-lookup column name, so consumers that query the prices
+# by comp_symbol keep working after the migration. Created by a later schema migration than the tables, once
+# legacy stock tables have their symbol_id column
+STOCK_VIEW_DDL = """
+CREATE OR REPLACE VIEW sp500_stock_view AS
+SELECT s.date, sym.name AS comp_symbol, s.adj_close, s.close_price, s.maximum_value, s.minimum_value,
+       s.opening_price, s.traded_volume
+FROM sp500_stock_table s
+JOIN symbol_lookup sym ON sym.symbol_id = s.symbol_id;
+"""
+
+
+def column_exists(cursor_object, table, column):
+    cursor_object.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s AND column_name = %s;
+    """, (table, column))
+    return cursor_object.fetchone() is not None
+
+
+# Creating the compact company/stock schema, converting tables left by earlier releases
+def ensure_dimension_schema(cursor_object):
+    legacy_company = column_exists(cursor_object, 'sp500_company', 'business_summary')
+    if legacy_company:
+        # Keep the legacy rows in a temporary copy so the new table can reuse the name and its constraints
+        cursor_object.execute("CREATE TEMP TABLE sp500_company_legacy AS SELECT * FROM sp500_company;")
+        cursor_object.execute("DROP TABLE sp500_company CASCADE;")
+
+    cursor_object.execute(DIMENSION_TABLES_DDL)
+
+    if legacy_company:
+        cursor_object.execute(MIGRATE_LEGACY_COMPANY)
+        log_progress("Legacy sp500_company table was migrated to the compact schema")
+
+    if column_exists(cursor_object, 'sp500_stock_table', 'comp_symbol'):
+        cursor_object.execute(MIGRATE_LEGACY_STOCK)
+        log_progress("Legacy sp500_stock_table was migrated to symbol ids")
+
+
+# In-process value -> id caches, one per lookup table (ids never change once assigned)
+_lookup_cache = {table: {} for table in LOOKUP_TABLES}
+_lookup_lock = threading.Lock()
+
+
+# Resolving values to lookup ids, inserting the ones seen for the first time
+def get_lookup_ids(cursor_object, table, values):
+    id_column = LOOKUP_TABLES[table]
+    values = {str(value) for value in values if value is not None and value != '' and value == value}
+
+    with _lookup_lock:
+        cache = _lookup_cache[table]
+        missing = sorted(values - cache.keys())
+
+    if missing:
+        cursor_object.execute(f"SELECT name, {id_column} FROM {table} WHERE name = ANY(%s);", (missing,))
+        found = dict(cursor_object.fetchall())
+
+        # Only names that are really new are inserted: nextval() runs before the conflict check, so sending
+        # known names through ON CONFLICT would use up the SMALLSERIAL ids on every run
+        new_values = [value for value in missing if value not in found]
+        if new_values:
+            cursor_object.execute(
+                f"INSERT INTO {table} (name) SELECT unnest(%s::text[]) ON CONFLICT (name) DO NOTHING;", (new_values,))
+            cursor_object.execute(f"SELECT name, {id_column} FROM {table} WHERE name = ANY(%s);", (new_values,))
+            found.update(cursor_object.fetchall())
+
+        with _lookup_lock:
+            cache.update(found)
+
+    with _lookup_lock:
+        return {value: cache[value] for value in values if value in cache}
+
+
+# Lookup ids inserted by a transaction that rolled back must not stay cached
+def clear_lookup_cache():
+    with _lookup_lock:
+        for cache in _lookup_cache.values():
+            cache.clear()
+
+
+def summary_hash(summary):
+    return hashlib.md5(str(summary or '').encode('utf-8')).hexdigest()
+
+
+# Writing only the summaries whose hash differs from the stored one; returns the number rewritten
+def upsert_company_summaries(cursor_object, summaries_by_symbol_id):
+    hashes = {symbol_id: summary_hash(summary) for symbol_id, summary in summaries_by_symbol_id.items()}
+
+    cursor_object.execute("SELECT symbol_id, summary_hash FROM company_summary WHERE symbol_id = ANY(%s);",
+                          (list(hashes),))
+    stored = dict(cursor_object.fetchall())
+
+    changed = [
+        (symbol_id, hashes[symbol_id], summaries_by_symbol_id[symbol_id])
+        for symbol_id in hashes if stored.get(symbol_id) != hashes[symbol_id]
+    ]
+    for row in changed:
+        cursor_object.execute("""
+            INSERT INTO company_summary (symbol_id, summary_hash, business_summary)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (symbol_id) DO UPDATE
+            SET summary_hash = EXCLUDED.summary_hash, business_summary = EXCLUDED.business_summary;
+        """, row)
+
+    log_progress(f"{len(changed)} of {len(hashes)} company summaries changed and were rewritten")
+    return len(changed)
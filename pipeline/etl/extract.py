@@ -1,10 +1,11 @@
 # Required modules and libraries
 import os
-import requests
 import pandas as pd
 import logging
 from dotenv import load_dotenv
 from bs4 import BeautifulSoup
+from pipeline.etl.landing import write_partition
+from pipeline.etl.http_client import ExtractError, get_default_client
 
 load_dotenv()
 
@@ -32,41 +33,39 @@ def log_progress(message):
     logger.debug(message)
 
 
-# Extracting data from API and converting it into .CSV format
-def fetch_data_from_api(api_endpoint):
-    api_status = None
+# Extracting data from API and landing it as a date-partitioned parquet file
+def fetch_data_from_api(api_endpoint, landing_dir=None, partition_date=None, client=None):
+    client = client or get_default_client()
     try:
-        response = requests.get(api_endpoint)
-        api_status = response.status_code
-        if api_status == 200:
-            log_progress(f"Completed - Connect to the API successfully")
-            data = response.json()
-            df_api = pd.json_normalize(data)
-            log_progress("Data was fetched successfully. Ready to be saved")
-
-            # Saving the extraceted data into ../data directory
-            save_path = os.path.join('../data', 'crypto.csv')
-            # Converting the file into .CSV format
-            df_api.to_csv(save_path, index=False)
-            log_progress(f"Data was saved successfully at {save_path}")
-
-        else:
-            log_progress("Connect to the API unsuccessfully")
-            df_api = pd.DataFrame()
+        response = client.get(api_endpoint)
+        log_progress(f"Completed - Connect to the API successfully")
+        data = response.json()
+
+        # The API reports failures with HTTP 200 and success = false
+        if isinstance(data, dict) and data.get('success') is False:
+            raise ExtractError(f"API returned an error payload: {data.get('error')}")
+
+        df_api = pd.json_normalize(data)
+        log_progress("Data was fetched successfully. Ready to be saved")
+
+        # Saving the extracted data under dataset=crypto/date=<run date>/
+        save_path = write_partition(df_api, 'crypto', partition_date, landing_dir)
+        log_progress(f"Data was saved successfully at {save_path}")
 
     except Exception as e:
-        log_progress(f"{api_status} : Encountered exception {e} while reading data from the api")
-        df_api = pd.DataFrame()
+        # Re-raise so the caller (and the DAG's retries) see the failure instead of an empty DataFrame
+        log_progress(f"Encountered exception {e} while reading data from the api")
+        raise
     return df_api
 
 
 # Extracting data through web scraping
-def scraping_websites(url_link):
-
+def scraping_websites(url_link, landing_dir=None, partition_date=None, client=None):
+    client = client or get_default_client()
     article_df = pd.DataFrame()
 
     try:
-        page = requests.get(url_link, timeout=10)
+        page = client.get(url_link)
         soup = BeautifulSoup(page.content, "html.parser")
         titles = soup.find_all('h3', class_='Mb(5px)')
 
@@ -84,14 +83,12 @@ def scraping_websites(url_link):
 
         article_df = pd.DataFrame(news_data)
 
-        # Directing data to the right folder
-        output_path = os.path.join('../data', 'scraped_articles.csv')
-
-        # Save the data frame as csv file
-        article_df.to_csv(output_path, index=False, encoding='utf-8')
-        log_progress(f"Data was extracted successfully and stored at ../data")
+        # Save the data frame under dataset=articles/date=<run date>/
+        output_path = write_partition(article_df, 'articles', partition_date, landing_dir)
+        log_progress(f"Data was extracted successfully and stored at {output_path}")
 
     except Exception as e:
         log_progress(f"An error occurred: {e}")
+        raise
 
     return article_df
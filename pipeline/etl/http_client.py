@@ -0,0 +1,233 @@
+import os
+import time
+import random
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlsplit
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# Setting up logging
+logger = logging.getLogger(__name__)
+
+
+# Setting up logging to log in the logs/ directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+log_file_path = os.path.join(current_dir, 'logs', 'code_log.txt')
+
+
+logging.basicConfig(
+    filename=log_file_path,  # Save the log file in logs/ directory
+    encoding='utf-8',
+    level=logging.DEBUG,
+    format='%(asctime)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+
+def log_progress(message):
+    logger.debug(message)
+
+
+# Raised when a source cannot be read, so the calling task fails and Airflow retries it
+class ExtractError(Exception):
+    pass
+
+
+class CircuitOpenError(ExtractError):
+    pass
+
+
+# Status codes worth retrying; any other non-2xx response fails immediately
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+# Per-host circuit breaker: opens after failure_threshold consecutive failures,
+# lets a single probe through after reset_timeout seconds
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow_request(self):
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.probe_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+# HTTP client for the extract layer: connect/read timeouts, jittered exponential backoff,
+# a circuit breaker per host and optional hedged requests
+class ResilientClient:
+    def __init__(self, connect_timeout=3.05, read_timeout=30.0, max_retries=3,
+                 backoff_base=0.5, backoff_max=30.0, failure_threshold=5, reset_timeout=60.0,
+                 hedge_percentile=None, hedge_min_samples=20, latency_window=200):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.latency_window = latency_window
+        self.session = requests.Session()
+        self._breakers = {}
+        self._latencies = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='hedge') if hedge_percentile else None
+
+    @classmethod
+    def from_env(cls):
+        hedge_percentile = os.getenv("EXTRACT_HEDGE_PERCENTILE")
+        return cls(
+            connect_timeout=float(os.getenv("EXTRACT_CONNECT_TIMEOUT", 3.05)),
+            read_timeout=float(os.getenv("EXTRACT_READ_TIMEOUT", 30)),
+            max_retries=int(os.getenv("EXTRACT_MAX_RETRIES", 3)),
+            backoff_base=float(os.getenv("EXTRACT_BACKOFF_BASE", 0.5)),
+            backoff_max=float(os.getenv("EXTRACT_BACKOFF_MAX", 30)),
+            failure_threshold=int(os.getenv("EXTRACT_BREAKER_FAILURES", 5)),
+            reset_timeout=float(os.getenv("EXTRACT_BREAKER_RESET", 60)),
+            hedge_percentile=float(hedge_percentile) if hedge_percentile else None
+        )
+
+    def breaker_for(self, host):
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[host]
+
+    def record_latency(self, host, seconds):
+        with self._lock:
+            self._latencies.setdefault(host, deque(maxlen=self.latency_window)).append(seconds)
+
+    # Delay after which a hedged second request is sent, or None while hedging is off / not warmed up
+    def hedge_delay(self, host):
+        if not self.hedge_percentile:
+            return None
+        with self._lock:
+            samples = sorted(self._latencies.get(host, ()))
+        if len(samples) < self.hedge_min_samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * self.hedge_percentile / 100))
+        return samples[index]
+
+    # Full-jitter exponential backoff
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _send(self, url, kwargs):
+        start = time.monotonic()
+        response = self.session.get(url, timeout=self.timeout, **kwargs)
+        return response, time.monotonic() - start
+
+    # One attempt, racing a second identical request once the primary is slower than the hedge delay
+    def _send_hedged(self, url, host, kwargs):
+        delay = self.hedge_delay(host)
+        if delay is None or self._executor is None:
+            return self._send(url, kwargs)
+
+        pending = {self._executor.submit(self._send, url, kwargs)}
+        done, pending = wait(pending, timeout=delay)
+        if not done:
+            log_progress(f"Request to {host} exceeded {delay:.3f}s, sending hedged request")
+            pending.add(self._executor.submit(self._send, url, kwargs))
+
+        error = None
+        while True:
+            for future in done:
+                try:
+                    response, elapsed = future.result()
+                except requests.RequestException as e:
+                    error = e
+                    continue
+                for other in pending:
+                    other.cancel()
+                return response, elapsed
+            if not pending:
+                raise error
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+    def get(self, url, **kwargs):
+        host = urlsplit(url).netloc
+        breaker = self.breaker_for(host)
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            if not breaker.allow_request():
+                raise CircuitOpenError(f"Circuit breaker for {host} is open, request to {url} not sent")
+
+            try:
+                response, elapsed = self._send_hedged(url, host, kwargs)
+            except requests.RequestException as e:
+                breaker.record_failure()
+                last_error = e
+                log_progress(f"Attempt {attempt + 1} to {host} failed: {e}")
+            except Exception:
+                # Not retried, but still recorded: a failed half-open probe must release the breaker
+                breaker.record_failure()
+                raise
+            else:
+                self.record_latency(host, elapsed)
+                if response.status_code < 400:
+                    breaker.record_success()
+                    return response
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    breaker.record_success()
+                    raise ExtractError(f"{response.status_code} response from {url}")
+                breaker.record_failure()
+                last_error = ExtractError(f"{response.status_code} response from {url}")
+                log_progress(f"Attempt {attempt + 1} to {host} returned {response.status_code}")
+
+            if attempt < self.max_retries:
+                time.sleep(self.backoff(attempt))
+
+        raise ExtractError(f"Giving up on {url} after {self.max_retries + 1} attempts: {last_error}")
+
+
+_default_client = None
+
+
+def get_default_client():
+    global _default_client
+    if _default_client is None:
+        _default_client = ResilientClient.from_env()
+    return _default_client
@@ -0,0 +1,115 @@
+import os
+import glob
+import logging
+from datetime import date, datetime
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# Setting up logging
+logger = logging.getLogger(__name__)
+
+
+# Setting up logging to log in the logs/ directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+log_file_path = os.path.join(current_dir, 'logs', 'code_log.txt')
+
+
+logging.basicConfig(
+    filename=log_file_path,  # Save the log file in logs/ directory
+    encoding='utf-8',
+    level=logging.DEBUG,
+    format='%(asctime)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+
+def log_progress(message):
+    logger.debug(message)
+
+
+# Root of the landing zone: <landing_dir>/dataset=<name>/date=YYYY-MM-DD/part.parquet. The default is
+# pipeline/data/landing, anchored to this module so it does not depend on the working directory
+DEFAULT_LANDING_DIR = os.path.join(current_dir, '..', 'data', 'landing')
+PARTITION_FILE = 'part.parquet'
+PARQUET_COMPRESSION = 'zstd'
+
+
+def get_landing_dir(landing_dir=None):
+    return landing_dir or os.getenv("LANDING_DATA_DIR") or DEFAULT_LANDING_DIR
+
+
+# Normalizing str/date/datetime values to the YYYY-MM-DD partition key
+def to_partition_key(value):
+    if value is None:
+        return date.today().isoformat()
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return pd.Timestamp(value).date().isoformat()
+
+
+def partition_path(dataset, partition_date, landing_dir=None):
+    return os.path.join(get_landing_dir(landing_dir),
+                        f"dataset={dataset}",
+                        f"date={to_partition_key(partition_date)}",
+                        PARTITION_FILE)
+
+
+# Writing one run of a dataset into its date partition (zstd-compressed parquet)
+def write_partition(dataframe, dataset, partition_date=None, landing_dir=None):
+    save_path = partition_path(dataset, partition_date, landing_dir)
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+
+    # Write to a temporary file first so a crashed run never leaves a half-written partition
+    tmp_path = f"{save_path}.tmp"
+    dataframe.to_parquet(tmp_path, engine='pyarrow', compression=PARQUET_COMPRESSION, index=False)
+    os.replace(tmp_path, save_path)
+
+    log_progress(f"Partition was saved successfully at {save_path}")
+    return save_path
+
+
+# Listing the partition dates available for a dataset
+def list_partitions(dataset, landing_dir=None):
+    dataset_dir = os.path.join(get_landing_dir(landing_dir), f"dataset={dataset}")
+    partition_dates = []
+    for path in glob.glob(os.path.join(dataset_dir, 'date=*', PARTITION_FILE)):
+        partition_dates.append(os.path.basename(os.path.dirname(path))[len('date='):])
+    return sorted(partition_dates)
+
+
+def partition_exists(dataset, partition_date, landing_dir=None):
+    return os.path.exists(partition_path(dataset, partition_date, landing_dir))
+
+
+# Reading a dataset, pruning partitions outside [start_date, end_date] before any file is opened
+def read_partitions(dataset, start_date=None, end_date=None, landing_dir=None, columns=None):
+    start_key = to_partition_key(start_date) if start_date is not None else None
+    end_key = to_partition_key(end_date) if end_date is not None else None
+
+    selected = [
+        partition_date for partition_date in list_partitions(dataset, landing_dir)
+        if (start_key is None or partition_date >= start_key)
+        and (end_key is None or partition_date <= end_key)
+    ]
+    log_progress(f"Reading {len(selected)} partition(s) of dataset={dataset}")
+
+    if not selected:
+        return pd.DataFrame()
+
+    frames = [
+        pd.read_parquet(partition_path(dataset, partition_date, landing_dir), engine='pyarrow', columns=columns)
+        for partition_date in selected
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+# Reading a transform input that is either a legacy .csv file or a landing zone directory
+def read_source(source, dataset, start_date=None, end_date=None):
+    if source is not None and os.path.isdir(rf"{source}"):
+        return read_partitions(dataset, start_date, end_date, landing_dir=source)
+    return pd.read_csv(rf"{source}")
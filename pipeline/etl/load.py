@@ -1,7 +1,14 @@
-import psycopg2
 import logging
 import os
 from dotenv import load_dotenv
+from psycopg2.extras import execute_values
+from pipeline.etl.db import get_connection
+from pipeline.etl.schema import ensure_schema, summarize_brin_index
+from pipeline.etl.query import invalidate_cache
+from pipeline.etl.aggregates import refresh_aggregates
+from pipeline.etl.notifications import publish_load_event
+from pipeline.etl.articles import insert_new_articles
+from pipeline.etl.dimensions import get_lookup_ids, upsert_company_summaries, clear_lookup_cache
 
 
 load_dotenv()
@@ -29,76 +36,100 @@ def log_progress(message):
     logger.debug(message)
 
 
-# Inserting data into sp500_company table:
+# Inserting data into the compact sp500_company dimension: categorical columns are stored as lookup ids
+# and the business summary is only rewritten when its hash changed
 def insert_sp500_company(dataframe):
     try:
-        connection = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
-        )
+        ensure_schema()
 
-        log_progress("Database connection established successfully.")
+        with get_connection() as connection:
+            log_progress("Database connection established successfully.")
 
-        cursor_object = connection.cursor()
+            cursor_object = connection.cursor()
+
+            # transform_sp500_data fills missing values with 0, which is not a category
+            def categories(column):
+                return [value for value in dataframe[column].unique() if value not in (0, '0')]
+
+            symbol_ids = get_lookup_ids(cursor_object, 'symbol_lookup', dataframe['symbol'].unique())
+            exchange_ids = get_lookup_ids(cursor_object, 'exchange_lookup', categories('exchange'))
+            sector_ids = get_lookup_ids(cursor_object, 'sector_lookup', categories('sector'))
+            industry_ids = get_lookup_ids(cursor_object, 'industry_lookup', categories('industry'))
+            country_ids = get_lookup_ids(cursor_object, 'country_lookup', categories('country'))
 
-        for index, row in dataframe.iterrows():
             query = """
-            INSERT INTO sp500_company (exchange, symbol, short_name, long_name, sector, industry,
-                                   current_stock_price, current_marketcap, ebitda, revenue_growth,
-                                   city, state, country, full_time_emp, business_summary, weight)
+            INSERT INTO sp500_company (symbol_id, exchange_id, short_name, long_name, sector_id, industry_id,
+                                       current_stock_price, current_marketcap, ebitda, revenue_growth,
+                                       city, state, country_id, full_time_emp, weight)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (symbol) DO NOTHING;
+            ON CONFLICT (symbol_id) DO UPDATE
+            SET exchange_id = EXCLUDED.exchange_id, short_name = EXCLUDED.short_name,
+                long_name = EXCLUDED.long_name, sector_id = EXCLUDED.sector_id,
+                industry_id = EXCLUDED.industry_id, current_stock_price = EXCLUDED.current_stock_price,
+                current_marketcap = EXCLUDED.current_marketcap, ebitda = EXCLUDED.ebitda,
+                revenue_growth = EXCLUDED.revenue_growth, city = EXCLUDED.city, state = EXCLUDED.state,
+                country_id = EXCLUDED.country_id, full_time_emp = EXCLUDED.full_time_emp,
+                weight = EXCLUDED.weight;
             """
-            cursor_object.execute(query, tuple(row))
 
-        connection.commit()
+            summaries = {}
+            for index, row in dataframe.iterrows():
+                symbol_id = symbol_ids[str(row['symbol'])]
+                summaries[symbol_id] = row['long_business_summary']
+                cursor_object.execute(query, (
+                    symbol_id, exchange_ids.get(str(row['exchange'])), row['short_name'], row['long_name'],
+                    sector_ids.get(str(row['sector'])), industry_ids.get(str(row['industry'])),
+                    row['current_price'], row['market_cap'], row['ebitda'], row['revenue_growth'],
+                    row['city'], row['state'], country_ids.get(str(row['country'])),
+                    row['full_time_employees'], row['weight']
+                ))
 
-        cursor_object.close()
+            upsert_company_summaries(cursor_object, summaries)
 
-        connection.close()
+            connection.commit()
+
+            cursor_object.close()
 
         log_progress("Data was loaded without any proplem")
 
     except Exception as e:
+        clear_lookup_cache()
         log_progress(f"Exception in loading data: {e}")
 
     finally:
-        log_progress("Loading process has completed successfully. Connection is closed")
+        log_progress("Loading process has completed. Connection is returned to the pool")
 
 
 # Inserting data into sp500_index table:
 def insert_sp500_index(dataframe):
     try:
-        connection = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
-        )
+        ensure_schema()
 
-        log_progress("Database connection established successfully.")
+        with get_connection() as connection:
+            log_progress("Database connection established successfully.")
 
-        cursor_object = connection.cursor()
+            cursor_object = connection.cursor()
 
-        log_progress("Data was read successfully. Initializing loading process...")
+            log_progress("Data was read successfully. Initializing loading process...")
 
-        for index, row in dataframe.iterrows():
-            query = """
-            INSERT INTO sp500_index_table (date, sp500_index_value)
-            VALUES (%s, %s)
-            ON CONFLICT (date) DO NOTHING;
-            """
-            cursor_object.execute(query, tuple(row))
+            loaded_dates = []
+            for index, row in dataframe.iterrows():
+                query = """
+                INSERT INTO sp500_index_table (date, sp500_index_value)
+                VALUES (%s, %s)
+                ON CONFLICT (date) DO NOTHING
+                RETURNING date;
+                """
+                cursor_object.execute(query, tuple(row))
+                loaded_dates += [inserted[0] for inserted in cursor_object.fetchall()]
 
-        connection.commit()
+            # Delivered to listeners only when this transaction commits, and only when rows were written
+            if loaded_dates:
+                publish_load_event(cursor_object, 'sp500_index_table', loaded_dates, row_count=len(loaded_dates))
 
-        cursor_object.close()
+            connection.commit()
 
-        connection.close()
+            cursor_object.close()
 
         log_progress("Data was loaded without any proplem")
 
@@ -106,115 +137,201 @@ def insert_sp500_index(dataframe):
         log_progress(f"Exception in loading data: {e}")
 
     finally:
-        log_progress("Loading process has completed successfully. Connection is closed")
+        log_progress("Loading process has completed. Connection is returned to the pool")
 
 
-# Inserting data into sp500_stock table:
-def insert_sp500_stock(dataframe):
+# Inserting data into sp500_stock table, storing each symbol as its small-integer symbol_id.
+# Symbol shards loading in parallel pass update_aggregates=False and refresh the aggregates of the returned dates
+# once afterwards. Returns (new rows written, sorted dates that got new rows), or None when the load failed
+def insert_sp500_stock(dataframe, page_size=5000, update_aggregates=True):
+    result = None
     try:
-        connection = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
-        )
+        ensure_schema()
+
+        with get_connection() as connection:
+            log_progress("Database connection established successfully.")
 
-        log_progress("Database connection established successfully.")
+            cursor_object = connection.cursor()
 
-        cursor_object = connection.cursor()
+            symbol_ids = get_lookup_ids(cursor_object, 'symbol_lookup', dataframe['comp_symbol'].unique())
 
-        for index, row in dataframe.iterrows():
+            # Rows already stored (same symbol and date) are skipped, so reruns are idempotent
             query = """
-            INSERT INTO sp500_stock_table (date, comp_symbol, adj_close, close_price, maximum_value,
-                                    minimum_value, opening_price, traded_volume)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            INSERT INTO sp500_stock_table (date, symbol_id, adj_close, close_price, maximum_value,
+                                           minimum_value, opening_price, traded_volume)
+            VALUES %s
+            ON CONFLICT (symbol_id, date) DO NOTHING
+            RETURNING date, symbol_id
             """
-            cursor_object.execute(query, tuple(row))
-
-        connection.commit()
-
-        cursor_object.close()
-
-        connection.close()
-
-        log_progress("Data was loaded without any problem.")
+            # Missing prices (NaN) are stored as NULL. Rows are written in date order so the table's
+            # physical order follows date and the BRIN index on it stays selective
+            rows = sorted(
+                (
+                    (row_date, symbol_ids[str(comp_symbol)], *[None if value != value else value for value in prices])
+                    for row_date, comp_symbol, *prices in dataframe.itertuples(index=False, name=None)
+                ),
+                key=lambda row: (str(row[0]), row[1])
+            )
+            inserted = execute_values(cursor_object, query, rows, page_size=page_size, fetch=True)
+            loaded_rows = len(inserted)
+            loaded_dates = sorted({row[0].isoformat() for row in inserted})
+            summarize_brin_index(cursor_object, 'sp500_stock_table')
+
+            # Update the sector/index aggregates for the dates that got new rows only, in the same transaction
+            if update_aggregates:
+                refresh_aggregates(cursor_object, loaded_dates)
+
+            # Delivered to listeners only when this transaction commits, and only when rows were written
+            if loaded_rows:
+                symbols_by_id = {symbol_id: symbol for symbol, symbol_id in symbol_ids.items()}
+                publish_load_event(cursor_object, 'sp500_stock_table', loaded_dates,
+                                   {symbols_by_id[row[1]] for row in inserted}, loaded_rows)
+
+            connection.commit()
+
+            cursor_object.close()
+
+        # Drop cached lookups of the symbols that were just written
+        invalidate_cache('sp500_stock_table', dataframe['comp_symbol'].unique())
+
+        result = (loaded_rows, loaded_dates)
+        log_progress(f"Data was loaded without any problem: {loaded_rows} new row(s) on {len(loaded_dates)} date(s).")
 
     except Exception as e:
+        result = None
+        clear_lookup_cache()
         log_progress(f"Exception in loading data: {e}")
 
     finally:
-        log_progress("Loading process has completed successfully. Connection is closed")
-
-
-# Inserting data into crypto table:
-def insert_crypto(dataframe):
+        log_progress("Loading process has completed. Connection is returned to the pool")
+
+    return result
+
+
+# Daily returns of the rows just written and of the stored row following each of them, taken against the
+# previous rate stored for the currency. Backfills load dates with gaps and out of order, so neither the
+# transform's value nor an existing return of the following row can be trusted; both lookups use the primary key
+FILL_CRYPTO_RETURNS = """
+WITH loaded AS (
+    SELECT * FROM unnest(%(currencies)s::text[], %(dates)s::date[]) AS l(currency, date)
+),
+targets AS (
+    SELECT currency, date FROM loaded
+    UNION
+    SELECT l.currency, n.date
+    FROM loaded l
+    CROSS JOIN LATERAL (
+        SELECT s.date FROM crypto_table s
+        WHERE s.currency = l.currency AND s.date > l.date
+        ORDER BY s.date
+        LIMIT 1
+    ) n
+)
+UPDATE crypto_table c
+SET daily_return = c.rate / NULLIF(prev.rate, 0) - 1
+FROM targets t
+LEFT JOIN LATERAL (
+    SELECT p.rate FROM crypto_table p
+    WHERE p.currency = t.currency AND p.date < t.date
+    ORDER BY p.date DESC
+    LIMIT 1
+) prev ON true
+WHERE c.currency = t.currency AND c.date = t.date
+  AND c.daily_return IS DISTINCT FROM c.rate / NULLIF(prev.rate, 0) - 1;
+"""
+
+
+# Inserting data into crypto table (one multi-row statement per page, so large backfills load in bulk).
+# Returns the number of rows written, or None when the load failed
+def insert_crypto(dataframe, page_size=5000):
+    loaded_rows = None
     try:
-        connection = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
-        )
+        ensure_schema()
 
-        log_progress("Database connection established successfully.")
+        with get_connection() as connection:
+            log_progress("Database connection established successfully.")
 
-        cursor_object = connection.cursor()
+            cursor_object = connection.cursor()
 
-        for index, row in dataframe.iterrows():
+            # Rates already stored for a currency and date are skipped, so reruns are idempotent
             query = """
             INSERT INTO crypto_table (time_stamp, target, date, currency, rate, daily_return)
-            VALUES (%s, %s, %s, %s, %s, %s);
+            VALUES %s
+            ON CONFLICT (currency, date) DO NOTHING
+            RETURNING currency, date;
             """
-            cursor_object.execute(query, tuple(row))
+            # Missing returns (NaN) are stored as NULL; returns are recomputed below from the stored rates
+            rows = [
+                tuple(None if value != value else value for value in row)
+                for row in dataframe.sort_values('date').itertuples(index=False, name=None)
+            ]
+            inserted = execute_values(cursor_object, query, rows, page_size=page_size, fetch=True)
+            written_rows = len(inserted)
+            summarize_brin_index(cursor_object, 'crypto_table')
+
+            cursor_object.execute(FILL_CRYPTO_RETURNS, {'currencies': [row[0] for row in inserted],
+                                                        'dates': [row[1] for row in inserted]})
 
-        connection.commit()
+            # Delivered to listeners only when this transaction commits, and only when rows were written
+            if written_rows:
+                publish_load_event(cursor_object, 'crypto_table', {row[1] for row in inserted},
+                                   {row[0] for row in inserted}, written_rows)
 
-        cursor_object.close()
+            connection.commit()
 
-        connection.close()
+            cursor_object.close()
 
+        # Drop cached lookups of the currencies that were just written
+        invalidate_cache('crypto_table', dataframe['currency'].unique())
+
+        loaded_rows = written_rows
         log_progress("Data was loaded without any problem")
 
     except Exception as e:
         log_progress(f"Exception in loading data: {e}")
 
     finally:
-        log_progress("Loading process has completed successfully. Connection is closed")
+        log_progress("Loading process has completed. Connection is returned to the pool")
+
+    return loaded_rows
 
 
 # Inserting data into visa_stock table:
 def insert_visa_stock(dataframe):
     try:
-        connection = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
-        )
+        ensure_schema()
 
-        log_progress("Database connection established successfully.")
+        with get_connection() as connection:
+            log_progress("Database connection established successfully.")
 
-        cursor_object = connection.cursor()
+            cursor_object = connection.cursor()
 
-        log_progress("Data was read successfully. Initializing loading process...")
+            log_progress("Data was read successfully. Initializing loading process...")
 
-        for index, row in dataframe.iterrows():
-            query = """
-            INSERT INTO visa_stock_table (date, open_price, high_price, low_price, closing_price,
-                                       adj_closing_price, trading_volume)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (date) DO NOTHING;
-            """
-            cursor_object.execute(query, tuple(row))
+            # The 'company' column added by transform_mvr_data is not stored
+            dataframe = dataframe.drop(columns=['company'], errors='ignore')
 
-        connection.commit()
+            loaded_dates = []
+            for index, row in dataframe.iterrows():
+                query = """
+                INSERT INTO visa_stock_table (date, open_price, high_price, low_price, closing_price,
+                                           adj_closing_price, trading_volume)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (date) DO NOTHING
+                RETURNING date;
+                """
+                cursor_object.execute(query, tuple(row))
+                loaded_dates += [inserted[0] for inserted in cursor_object.fetchall()]
 
-        cursor_object.close()
+            # Delivered to listeners only when this transaction commits, and only when rows were written
+            if loaded_dates:
+                publish_load_event(cursor_object, 'visa_stock_table', loaded_dates, row_count=len(loaded_dates))
 
-        connection.close()
+            connection.commit()
+
+            cursor_object.close()
+
+        invalidate_cache('visa_stock_table')
 
         log_progress("Data was loaded without any problem")
 
@@ -222,40 +339,45 @@ def insert_visa_stock(dataframe):
         log_progress(f"Exception in loading data: {e}")
 
     finally:
-        log_progress("Loading process has completed successfully. Connection is closed")
+        log_progress("Loading process has completed. Connection is returned to the pool")
 
 
 # Inserting data into Mastercard_stock table
 def insert_mastercard_stock(dataframe):
     try:
-        connection = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
-        )
+        ensure_schema()
 
-        log_progress("Database connection established successfully.")
+        with get_connection() as connection:
+            log_progress("Database connection established successfully.")
 
-        cursor_object = connection.cursor()
+            cursor_object = connection.cursor()
 
-        log_progress("Data was read successfully. Initializing loading process...")
+            log_progress("Data was read successfully. Initializing loading process...")
 
-        for index, row in dataframe.iterrows():
-            query = """
-            INSERT INTO mastercard_stock_table (date, open_price, high_price, low_price, closing_price,
-                                         adj_closing_price, trading_volume)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (date) DO NOTHING;
-            """
-            cursor_object.execute(query, tuple(row))
+            # The 'company' column added by transform_mvr_data is not stored
+            dataframe = dataframe.drop(columns=['company'], errors='ignore')
+
+            loaded_dates = []
+            for index, row in dataframe.iterrows():
+                query = """
+                INSERT INTO mastercard_stock_table (date, open_price, high_price, low_price, closing_price,
+                                             adj_closing_price, trading_volume)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (date) DO NOTHING
+                RETURNING date;
+                """
+                cursor_object.execute(query, tuple(row))
+                loaded_dates += [inserted[0] for inserted in cursor_object.fetchall()]
 
-        connection.commit()
+            # Delivered to listeners only when this transaction commits, and only when rows were written
+            if loaded_dates:
+                publish_load_event(cursor_object, 'mastercard_stock_table', loaded_dates, row_count=len(loaded_dates))
 
-        cursor_object.close()
+            connection.commit()
 
-        connection.close()
+            cursor_object.close()
+
+        invalidate_cache('mastercard_stock_table')
 
         log_progress("Data was loaded without any problem")
 
@@ -263,42 +385,34 @@ def insert_mastercard_stock(dataframe):
         log_progress(f"Exception in loading data: {e}")
 
     finally:
-        log_progress("Loading process has completed successfully. Connection is closed")
+        log_progress("Loading process has completed. Connection is returned to the pool")
 
 
-# Inserting data into articles table:
+# Inserting data into articles table: only new links are written, each with its search vector
+# and the sp500 tickers mentioned in its title
 def insert_articles(dataframe):
     try:
-        connection = psycopg2.connect(
-            dbname=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            host=os.getenv("DB_HOST"),
-            port=os.getenv("DB_PORT")
-        )
+        ensure_schema()
 
-        log_progress("Database connection established successfully.")
+        with get_connection() as connection:
+            log_progress("Database connection established successfully.")
 
-        cursor_object = connection.cursor()
+            cursor_object = connection.cursor()
 
-        for index, row in dataframe.iterrows():
-            query = """
-            INSERT INTO articles_table (title, link)
-            VALUES (%s, %s);
-            """
-            cursor_object.execute(query, tuple(row))
-
-        connection.commit()
+            # One row per link, keeping the first title seen
+            unique_df = dataframe[['title', 'link']].drop_duplicates(subset='link', keep='first')
+            rows = list(unique_df.itertuples(index=False, name=None))
+            new_articles, ticker_links = insert_new_articles(cursor_object, rows)
 
-        cursor_object.close()
+            connection.commit()
 
-        connection.close()
+            cursor_object.close()
 
-        log_progress("Data was loaded without any problem")
+        log_progress(f"Data was loaded without any problem: {new_articles} new article(s), "
+                     f"{ticker_links} ticker mention(s)")
 
     except Exception as e:
         log_progress(f"Exception in loading data: {e}")
 
     finally:
-        log_progress("Loading process has completed successfully. Connection is closed")
-        
+        log_progress("Loading process has completed. Connection is returned to the pool")
@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import select
+import logging
+import psycopg2
+from psycopg2 import extensions
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# Setting up logging
+logger = logging.getLogger(__name__)
+
+
+# Setting up logging to log in the logs/ directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+log_file_path = os.path.join(current_dir, 'logs', 'code_log.txt')
+
+
+logging.basicConfig(
+    filename=log_file_path,  # Save the log file in logs/ directory
+    encoding='utf-8',
+    level=logging.DEBUG,
+    format='%(asctime)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+
+def log_progress(message):
+    logger.debug(message)
+
+
+# Channel the load step notifies on
+LOAD_EVENTS_CHANNEL = os.getenv("LOAD_EVENTS_CHANNEL", "pipeline_load_events")
+
+# Event ids are taken at INSERT but become visible at COMMIT, so concurrent loads (e.g. parallel stock shards)
+# can commit out of id order. Replays re-read this many ids below the last handled one; already handled
+# events among them are skipped by the subscriber's seen set
+REPLAY_MARGIN = int(os.getenv("LOAD_EVENTS_REPLAY_MARGIN", 1000))
+
+# NOTIFY payloads must stay below 8000 bytes; larger symbol lists are read back from the outbox
+MAX_PAYLOAD_BYTES = 7500
+
+# Outbox: one durable row per committed load, written in the same transaction as the data.
+# Created by the schema migrations; subscribers also create it so they can start before the first load
+OUTBOX_DDL = """
+CREATE TABLE IF NOT EXISTS load_events (
+    event_id BIGSERIAL PRIMARY KEY,
+    table_name TEXT NOT NULL,
+    min_date DATE,
+    max_date DATE,
+    symbols TEXT[],
+    row_count INTEGER NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+"""
+
+
+def create_outbox_table(cursor_object):
+    cursor_object.execute(OUTBOX_DDL)
+
+
+# Recording a load event inside the caller's transaction. NOTIFY is transactional, so listeners
+# only hear about it once the data is committed, and never if the load rolls back
+def publish_load_event(cursor_object, table, dates=None, symbols=None, row_count=0):
+    dates = sorted(str(loaded_date)[:10] for loaded_date in (dates if dates is not None else []))
+    symbols = sorted({str(symbol) for symbol in symbols}) if symbols is not None else None
+
+    cursor_object.execute("""
+        INSERT INTO load_events (table_name, min_date, max_date, symbols, row_count)
+        VALUES (%s, %s, %s, %s, %s)
+        RETURNING event_id, created_at;
+    """, (table, dates[0] if dates else None, dates[-1] if dates else None, symbols, int(row_count)))
+    event_id, created_at = cursor_object.fetchone()
+
+    event = {
+        'event_id': event_id,
+        'table': table,
+        'min_date': dates[0] if dates else None,
+        'max_date': dates[-1] if dates else None,
+        'symbols': symbols,
+        'row_count': int(row_count),
+        'created_at': created_at.isoformat(),
+    }
+    payload = json.dumps(event)
+    if len(payload.encode('utf-8')) > MAX_PAYLOAD_BYTES:
+        event['symbols'] = None
+        event['symbols_truncated'] = True
+        payload = json.dumps(event)
+
+    cursor_object.execute("SELECT pg_notify(%s, %s);", (LOAD_EVENTS_CHANNEL, payload))
+    log_progress(f"Load event {event_id} for {table} was queued ({int(row_count)} rows)")
+    return event_id
+
+
+def row_to_event(row):
+    event_id, table, min_date, max_date, symbols, row_count, created_at = row
+    return {
+        'event_id': event_id,
+        'table': table,
+        'min_date': min_date.isoformat() if min_date else None,
+        'max_date': max_date.isoformat() if max_date else None,
+        'symbols': symbols,
+        'row_count': row_count,
+        'created_at': created_at.isoformat(),
+    }
+
+
+# Subscriber for downstream consumers: replays events missed while disconnected from the outbox,
+# then waits on LISTEN. Delivery is at-least-once across restarts (resume with last_event_id); events
+# within REPLAY_MARGIN of it may be delivered again after a restart, so callbacks should be idempotent
+class LoadEventSubscriber:
+    def __init__(self, tables=None, last_event_id=0, channel=LOAD_EVENTS_CHANNEL):
+        self.tables = set(tables) if tables else None
+        self.last_event_id = last_event_id
+        self.channel = channel
+        self.connection = None
+        self.seen_event_ids = set()
+
+    def connect(self):
+        # LISTEN needs its own autocommit session, so this connection is not taken from the pool
+        self.connection = psycopg2.connect(
+            dbname=os.getenv("DB_NAME"),
+            user=os.getenv("DB_USER"),
+            password=os.getenv("DB_PASSWORD"),
+            host=os.getenv("DB_HOST"),
+            port=os.getenv("DB_PORT")
+        )
+        self.connection.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with self.connection.cursor() as cursor_object:
+            create_outbox_table(cursor_object)
+            cursor_object.execute(f"LISTEN {self.channel};")
+        log_progress(f"Listening for load events on {self.channel}")
+
+    def close(self):
+        if self.connection is not None and not self.connection.closed:
+            self.connection.close()
+        self.connection = None
+
+    def fetch_events(self, where, params):
+        with self.connection.cursor() as cursor_object:
+            cursor_object.execute(f"""
+                SELECT event_id, table_name, min_date, max_date, symbols, row_count, created_at
+                FROM load_events
+                WHERE {where}
+                ORDER BY event_id;
+            """, params)
+            return [row_to_event(row) for row in cursor_object.fetchall()]
+
+    # Each event is handed to the callback once per subscriber, even if it arrives by both paths. It only
+    # counts as handled once the callback returned, so an event whose callback raised is replayed
+    def dispatch(self, event, callback):
+        event_id = event['event_id']
+        if event_id in self.seen_event_ids:
+            return False
+
+        if self.tables is None or event['table'] in self.tables:
+            callback(event)
+
+        self.seen_event_ids.add(event_id)
+        self.last_event_id = max(self.last_event_id, event_id)
+        keep_ids = max(5000, 2 * REPLAY_MARGIN)
+        if len(self.seen_event_ids) > 2 * keep_ids:
+            self.seen_event_ids = {seen for seen in self.seen_event_ids if seen > self.last_event_id - keep_ids}
+        return True
+
+    # Handing events to the callback in id order. If it raises, the connection is dropped so the next
+    # poll reconnects and replays from the outbox, including the failed event
+    def dispatch_all(self, events, callback):
+        handled = []
+        try:
+            for event in sorted(events, key=lambda item: item['event_id']):
+                if self.dispatch(event, callback):
+                    handled.append(event)
+        except Exception:
+            self.close()
+            raise
+        return handled
+
+    # Waiting up to timeout seconds for notifications; returns the events handled
+    def poll(self, callback, timeout=60.0):
+        handled = []
+        if self.connection is None or self.connection.closed:
+            self.connect()
+            # LISTEN is active before the catch-up read, so nothing committed in between is lost
+            replay_from = max(0, self.last_event_id - REPLAY_MARGIN)
+            handled += self.dispatch_all(self.fetch_events("event_id > %s", (replay_from,)), callback)
+
+        if select.select([self.connection], [], [], timeout) == ([], [], []):
+            return handled
+
+        self.connection.poll()
+        notifies = list(self.connection.notifies)
+        self.connection.notifies.clear()
+        events = [json.loads(notify.payload) for notify in notifies]
+
+        # Events whose symbol list did not fit in the payload are read back from the outbox
+        truncated_ids = [event['event_id'] for event in events if event.get('symbols_truncated')]
+        if truncated_ids:
+            stored = self.fetch_events("event_id = ANY(%s)", (truncated_ids,))
+            full_events = {event['event_id']: event for event in stored}
+            events = [full_events.get(event['event_id'], event) for event in events]
+
+        handled += self.dispatch_all(events, callback)
+        return handled
+
+    # Blocking loop; reconnects and replays from the outbox after connection failures
+    def listen(self, callback, timeout=60.0, reconnect_delay=5.0):
+        while True:
+            try:
+                self.poll(callback, timeout)
+            except psycopg2.OperationalError as e:
+                log_progress(f"Load event listener lost its connection: {e}. Reconnecting...")
+                self.close()
+                time.sleep(reconnect_delay)
+            except Exception as e:
+                log_progress(f"Load event callback failed: {e}. Replaying from event {self.last_event_id}...")
+                self.close()
+                time.sleep(reconnect_delay)
+
+
+# Ready-made callback that keeps the query cache of a consumer process in step with loads
+def invalidate_query_cache(event):
+    from pipeline.etl.query import invalidate_cache
+    invalidate_cache(event['table'], event['symbols'])
+
+
+if __name__ == '__main__':
+    # Printing load events as they are committed: python -m pipeline.etl.notifications [table ...]
+    import sys
+    LoadEventSubscriber(tables=sys.argv[1:]).listen(lambda event: print(json.dumps(event), flush=True))
@@ -0,0 +1,178 @@
+import os
+import sys
+import time
+import pstats
+import cProfile
+import logging
+import threading
+import functools
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# Setting up logging
+logger = logging.getLogger(__name__)
+
+
+# Setting up logging to log in the logs/ directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+log_file_path = os.path.join(current_dir, 'logs', 'code_log.txt')
+
+
+logging.basicConfig(
+    filename=log_file_path,  # Save the log file in logs/ directory
+    encoding='utf-8',
+    level=logging.DEBUG,
+    format='%(asctime)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+
+def log_progress(message):
+    logger.debug(message)
+
+
+# PIPELINE_PROFILE=1|all (cProfile + sampled stacks), cprofile or sample; unset/0 disables profiling
+PROFILE_ENV = "PIPELINE_PROFILE"
+PROFILE_DIR_ENV = "PIPELINE_PROFILE_DIR"
+SAMPLE_INTERVAL_ENV = "PIPELINE_PROFILE_INTERVAL"
+DEFAULT_PROFILE_DIR = os.path.join(current_dir, 'logs', 'profiles')
+PROFILE_MODES = ('all', 'cprofile', 'sample')
+
+
+# Unknown values raise instead of silently profiling with only tracemalloc, as --profile rejects them too
+def profiling_mode():
+    mode = os.getenv(PROFILE_ENV, '').strip().lower()
+    if mode in ('', '0', 'false', 'no', 'off'):
+        return None
+    if mode in ('1', 'true', 'yes', 'on'):
+        return 'all'
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"{PROFILE_ENV}={mode!r} is not a profiling mode; use one of {', '.join(PROFILE_MODES)} or 0")
+    return mode
+
+
+# Used by the --profile CLI flag; exported through the environment so child processes inherit it
+def enable_profiling(mode='all'):
+    os.environ[PROFILE_ENV] = mode
+
+
+# Background thread that samples the profiled thread's stack into collapsed "a;b;c count" lines
+class StackSampler(threading.Thread):
+    def __init__(self, thread_id, interval):
+        super().__init__(name='stack-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+# Profiling one stage call and writing <stage>_<timestamp>.{pstats,folded,memory.txt}
+class StageProfiler:
+    def __init__(self, stage_name, mode, output_dir=None):
+        self.stage_name = stage_name
+        self.mode = mode
+        self.output_dir = output_dir or os.getenv(PROFILE_DIR_ENV) or DEFAULT_PROFILE_DIR
+        self.interval = float(os.getenv(SAMPLE_INTERVAL_ENV, 0.005))
+        self.profiler = None
+        self.sampler = None
+        self.started_tracemalloc = False
+
+    def __enter__(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            self.started_tracemalloc = True
+        tracemalloc.reset_peak()
+        self.memory_before = tracemalloc.take_snapshot()
+
+        if self.mode in ('all', 'sample'):
+            self.sampler = StackSampler(threading.get_ident(), self.interval)
+            self.sampler.start()
+        if self.mode in ('all', 'cprofile'):
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.perf_counter() - self.started_at
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.sampler is not None:
+            self.sampler.stop()
+        memory_after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+
+        try:
+            self.write_reports(elapsed, memory_after, peak)
+        except Exception as e:
+            log_progress(f"Exception in writing profile of {self.stage_name}: {e}")
+        return False
+
+    def write_reports(self, elapsed, memory_after, peak):
+        os.makedirs(self.output_dir, exist_ok=True)
+        prefix = os.path.join(self.output_dir, f"{self.stage_name}_{datetime.now():%Y%m%d_%H%M%S_%f}")
+
+        # cProfile stats (load with pstats, snakeviz or flameprof)
+        if self.profiler is not None:
+            self.profiler.dump_stats(f"{prefix}.pstats")
+
+        # Collapsed stacks for flamegraph.pl / speedscope
+        if self.sampler is not None:
+            with open(f"{prefix}.folded", 'w', encoding='utf-8') as folded_file:
+                for stack, count in self.sampler.stacks.most_common():
+                    folded_file.write(f"{stack} {count}\n")
+
+        with open(f"{prefix}.memory.txt", 'w', encoding='utf-8') as memory_file:
+            memory_file.write(f"stage: {self.stage_name}\nwall time: {elapsed:.3f}s\n"
+                              f"peak traced memory: {peak / 1024 / 1024:.2f} MiB\n\n")
+            memory_file.write("Top allocations grown during the stage:\n")
+            # Leave out the profiler's own allocations (sampled stacks, snapshots)
+            own_traces = [tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__)]
+            memory_after = memory_after.filter_traces(own_traces)
+            memory_before = self.memory_before.filter_traces(own_traces)
+            for stat in memory_after.compare_to(memory_before, 'lineno')[:25]:
+                memory_file.write(f"{stat}\n")
+            if self.profiler is not None:
+                memory_file.write("\nTop functions by cumulative time:\n")
+                stats = pstats.Stats(self.profiler, stream=memory_file)
+                stats.sort_stats('cumulative').print_stats(25)
+
+        log_progress(f"Profile of {self.stage_name} ({elapsed:.3f}s) was saved at {prefix}.*")
+
+
+# Wrapping an extract/transform/load callable; returns it untouched when profiling is disabled
+def profile_stage(func, stage_name=None):
+    mode = profiling_mode()
+    if mode is None:
+        return func
+
+    stage_name = stage_name or func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with StageProfiler(stage_name, mode):
+            return func(*args, **kwargs)
+
+    return wrapper
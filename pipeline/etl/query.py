@@ -0,0 +1,267 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+from pipeline.etl.db import get_connection
+
+load_dotenv()
+
+
+# Setting up logging
+logger = logging.getLogger(__name__)
+
+
+# Setting up logging to log in the logs/ directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+log_file_path = os.path.join(current_dir, 'logs', 'code_log.txt')
+
+
+logging.basicConfig(
+    filename=log_file_path,  # Save the log file in logs/ directory
+    encoding='utf-8',
+    level=logging.DEBUG,
+    format='%(asctime)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+
+def log_progress(message):
+    logger.debug(message)
+
+
+# Thread-safe LRU cache whose entries also expire after ttl_seconds. Keys are (table, query, symbol, params);
+# invalidate() bumps a generation per table and per (table, symbol), so a reader whose query started before
+# a load was invalidated cannot cache its stale rows afterwards
+class TTLCache:
+    def __init__(self, maxsize=1024, ttl_seconds=300):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._table_generations = {}
+        self._symbol_generations = {}
+        self._lock = threading.Lock()
+
+    def _generation(self, table, symbol):
+        return self._table_generations.get(table, 0), self._symbol_generations.get((table, symbol), 0)
+
+    # Read before running a query and passed to set() with its result
+    def generation(self, table, symbol):
+        with self._lock:
+            return self._generation(table, str(symbol))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    # Storing a value, unless its table or symbol was invalidated since the given generation was read
+    def set(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self._generation(key[0], key[2]):
+                return False
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return True
+
+    # Dropping every entry of a table, or only the entries of the given symbols
+    def invalidate(self, table, symbols=None):
+        symbols = None if symbols is None else {str(symbol) for symbol in symbols}
+        with self._lock:
+            if symbols is None:
+                self._table_generations[table] = self._table_generations.get(table, 0) + 1
+            else:
+                for symbol in symbols:
+                    self._symbol_generations[(table, symbol)] = self._symbol_generations.get((table, symbol), 0) + 1
+            stale_keys = [
+                key for key in self._entries
+                if key[0] == table and (symbols is None or key[2] in symbols)
+            ]
+            for key in stale_keys:
+                del self._entries[key]
+        return len(stale_keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+query_cache = TTLCache(
+    maxsize=int(os.getenv("QUERY_CACHE_SIZE", 1024)),
+    ttl_seconds=float(os.getenv("QUERY_CACHE_TTL_SECONDS", 300))
+)
+
+
+# Server-side prepared statements: name -> (table, parameter types, SQL)
+PREPARED_QUERIES = {
+    'latest_stock_price': ('sp500_stock_table', '(text)', """
+        SELECT s.date, sym.name AS comp_symbol, s.adj_close, s.close_price, s.maximum_value,
+               s.minimum_value, s.opening_price, s.traded_volume
+        FROM sp500_stock_table s
+        JOIN symbol_lookup sym ON sym.symbol_id = s.symbol_id
+        WHERE sym.name = $1
+        ORDER BY s.date DESC
+        LIMIT 1
+    """),
+    'stock_history': ('sp500_stock_table', '(text, int)', """
+        SELECT s.date, sym.name AS comp_symbol, s.adj_close, s.close_price, s.maximum_value,
+               s.minimum_value, s.opening_price, s.traded_volume
+        FROM sp500_stock_table s
+        JOIN symbol_lookup sym ON sym.symbol_id = s.symbol_id
+        WHERE sym.name = $1
+        ORDER BY s.date DESC
+        LIMIT $2
+    """),
+    'latest_crypto_rate': ('crypto_table', '(text)', """
+        SELECT time_stamp, target, date, currency, rate, daily_return
+        FROM crypto_table
+        WHERE currency = $1
+        ORDER BY date DESC
+        LIMIT 1
+    """),
+    'crypto_history': ('crypto_table', '(text, int)', """
+        SELECT time_stamp, target, date, currency, rate, daily_return
+        FROM crypto_table
+        WHERE currency = $1
+        ORDER BY date DESC
+        LIMIT $2
+    """),
+    'latest_visa_price': ('visa_stock_table', '', """
+        SELECT date, open_price, high_price, low_price, closing_price, adj_closing_price, trading_volume
+        FROM visa_stock_table
+        ORDER BY date DESC
+        LIMIT 1
+    """),
+    'visa_history': ('visa_stock_table', '(int)', """
+        SELECT date, open_price, high_price, low_price, closing_price, adj_closing_price, trading_volume
+        FROM visa_stock_table
+        ORDER BY date DESC
+        LIMIT $1
+    """),
+    'latest_mastercard_price': ('mastercard_stock_table', '', """
+        SELECT date, open_price, high_price, low_price, closing_price, adj_closing_price, trading_volume
+        FROM mastercard_stock_table
+        ORDER BY date DESC
+        LIMIT 1
+    """),
+    'mastercard_history': ('mastercard_stock_table', '(int)', """
+        SELECT date, open_price, high_price, low_price, closing_price, adj_closing_price, trading_volume
+        FROM mastercard_stock_table
+        ORDER BY date DESC
+        LIMIT $1
+    """),
+    'search_articles': ('articles_table', '(text, int)', """
+        SELECT article_id, title, link, ts_rank(search_vector, query) AS rank
+        FROM articles_table, websearch_to_tsquery('english', $1) AS query
+        WHERE search_vector @@ query
+        ORDER BY rank DESC, article_id DESC
+        LIMIT $2
+    """),
+    'articles_for_symbol': ('article_ticker', '(text, int)', """
+        SELECT a.article_id, a.title, a.link
+        FROM article_ticker t
+        JOIN symbol_lookup sym ON sym.symbol_id = t.symbol_id
+        JOIN articles_table a ON a.article_id = t.article_id
+        WHERE sym.name = $1
+        ORDER BY a.article_id DESC
+        LIMIT $2
+    """),
+}
+
+# Symbols used as cache keys for the single-company Visa/Mastercard tables
+CARD_SYMBOLS = {'visa': 'V', 'mastercard': 'MA'}
+
+
+# Running a prepared statement on a pooled connection, preparing it once per server session
+def execute_prepared(name, params=()):
+    table, param_types, sql = PREPARED_QUERIES[name]
+    with get_connection() as connection:
+        with connection.cursor() as cursor_object:
+            if name not in connection.prepared_statements:
+                cursor_object.execute(f"PREPARE {name} {param_types} AS {sql}")
+                connection.prepared_statements.add(name)
+
+            if params:
+                placeholders = ", ".join(["%s"] * len(params))
+                cursor_object.execute(f"EXECUTE {name} ({placeholders})", tuple(params))
+            else:
+                cursor_object.execute(f"EXECUTE {name}")
+
+            columns = [column.name for column in cursor_object.description]
+            rows = [dict(zip(columns, row)) for row in cursor_object.fetchall()]
+        connection.commit()
+    return rows
+
+
+# Serving a lookup from the cache, falling back to the prepared statement on a miss
+def cached_query(name, symbol, params=(), use_cache=True):
+    table = PREPARED_QUERIES[name][0]
+    key = (table, name, str(symbol), tuple(params))
+
+    if use_cache:
+        rows = query_cache.get(key)
+        if rows is not None:
+            return rows
+        # A load invalidating this symbol while the query runs makes the result stale; it is then not cached
+        generation = query_cache.generation(table, symbol)
+
+    rows = execute_prepared(name, params)
+    if use_cache:
+        query_cache.set(key, rows, generation)
+    return rows
+
+
+# Called by the load step after commit so readers in this process never see stale prices
+def invalidate_cache(table, symbols=None):
+    removed = query_cache.invalidate(table, symbols)
+    log_progress(f"Query cache invalidated for {table}: {removed} entries removed")
+    return removed
+
+
+def get_latest_stock_price(symbol, use_cache=True):
+    rows = cached_query('latest_stock_price', symbol, (symbol,), use_cache)
+    return rows[0] if rows else None
+
+
+def get_stock_history(symbol, days=30, use_cache=True):
+    return cached_query('stock_history', symbol, (symbol, int(days)), use_cache)
+
+
+def get_latest_crypto_rate(currency, use_cache=True):
+    rows = cached_query('latest_crypto_rate', currency, (currency,), use_cache)
+    return rows[0] if rows else None
+
+
+def get_crypto_history(currency, days=30, use_cache=True):
+    return cached_query('crypto_history', currency, (currency, int(days)), use_cache)
+
+
+def get_latest_card_price(company, use_cache=True):
+    company = company.lower()
+    rows = cached_query(f'latest_{company}_price', CARD_SYMBOLS[company], (), use_cache)
+    return rows[0] if rows else None
+
+
+def get_card_history(company, days=30, use_cache=True):
+    company = company.lower()
+    return cached_query(f'{company}_history', CARD_SYMBOLS[company], (int(days),), use_cache)
+
+
+# Full-text search over article titles (served by the GIN index on search_vector), not cached
+def search_articles(text, limit=20):
+    return execute_prepared('search_articles', (text, int(limit)))
+
+
+# Latest articles mentioning a ticker symbol, through the article_ticker join table
+def get_articles_for_symbol(symbol, limit=20):
+    return execute_prepared('articles_for_symbol', (symbol, int(limit)))
@@ -0,0 +1,226 @@
+import os
+import logging
+import argparse
+from dotenv import load_dotenv
+from pipeline.etl.db import get_connection
+from pipeline.etl.dimensions import ensure_dimension_schema, STOCK_VIEW_DDL
+from pipeline.etl.articles import ensure_article_schema
+from pipeline.etl.aggregates import AGGREGATE_TABLES_DDL
+from pipeline.etl.notifications import OUTBOX_DDL
+
+load_dotenv()
+
+
+# Setting up logging
+logger = logging.getLogger(__name__)
+
+
+# Setting up logging to log in the logs/ directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+log_file_path = os.path.join(current_dir, 'logs', 'code_log.txt')
+
+
+logging.basicConfig(
+    filename=log_file_path,  # Save the log file in logs/ directory
+    encoding='utf-8',
+    level=logging.DEBUG,
+    format='%(asctime)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+
+def log_progress(message):
+    logger.debug(message)
+
+
+# Serializes migrations between concurrent loaders (pg_advisory_xact_lock key)
+SCHEMA_LOCK_ID = 5035001
+
+SCHEMA_MIGRATIONS_DDL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    description TEXT NOT NULL,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+"""
+
+# Tables loaded straight from the transforms; primary keys are the loaders' ON CONFLICT keys
+BASE_TABLES_DDL = """
+CREATE TABLE IF NOT EXISTS sp500_index_table (
+    date DATE PRIMARY KEY,
+    sp500_index_value DOUBLE PRECISION
+);
+
+CREATE TABLE IF NOT EXISTS crypto_table (
+    time_stamp TIMESTAMP,
+    target TEXT,
+    date DATE NOT NULL,
+    currency TEXT NOT NULL,
+    rate DOUBLE PRECISION,
+    daily_return DOUBLE PRECISION,
+    PRIMARY KEY (currency, date)
+);
+
+CREATE TABLE IF NOT EXISTS visa_stock_table (
+    date DATE PRIMARY KEY,
+    open_price DOUBLE PRECISION,
+    high_price DOUBLE PRECISION,
+    low_price DOUBLE PRECISION,
+    closing_price DOUBLE PRECISION,
+    adj_closing_price DOUBLE PRECISION,
+    trading_volume BIGINT
+);
+
+CREATE TABLE IF NOT EXISTS mastercard_stock_table (
+    date DATE PRIMARY KEY,
+    open_price DOUBLE PRECISION,
+    high_price DOUBLE PRECISION,
+    low_price DOUBLE PRECISION,
+    closing_price DOUBLE PRECISION,
+    adj_closing_price DOUBLE PRECISION,
+    trading_volume BIGINT
+);
+"""
+
+# Upsert keys of every loader: table -> primary key columns. The btree behind
+# sp500_stock_table's key also serves "latest / last N days per symbol" lookups
+UPSERT_KEYS = {
+    'sp500_index_table': ('date',),
+    'visa_stock_table': ('date',),
+    'mastercard_stock_table': ('date',),
+    'crypto_table': ('currency', 'date'),
+    'sp500_stock_table': ('symbol_id', 'date'),
+}
+
+# The price tables are append-only and loaded in date order, so a BRIN index answers date-range
+# scans at a fraction of a btree's size and insert cost: table -> BRIN index on date
+BRIN_INDEXES = {
+    'sp500_stock_table': 'sp500_stock_table_date_brin',
+    'crypto_table': 'crypto_table_date_brin',
+}
+
+TIME_SERIES_INDEXES_DDL = "".join(
+    f"CREATE INDEX IF NOT EXISTS {index} ON {table} USING BRIN (date) "
+    f"WITH (pages_per_range = 32, autosummarize = on);\n"
+    for table, index in BRIN_INDEXES.items()
+)
+
+
+# Unique, valid, non-partial index on exactly the given columns, which ON CONFLICT (columns) can infer
+UPSERT_KEY_INDEX_QUERY = """
+SELECT 1
+FROM pg_index i
+WHERE i.indrelid = %(table)s::regclass
+  AND i.indisunique AND i.indisvalid AND i.indpred IS NULL
+  AND i.indnkeyatts = cardinality(%(columns)s::text[])
+  AND (SELECT array_agg(a.attname::text ORDER BY a.attname)
+       FROM pg_attribute a
+       WHERE a.attrelid = i.indrelid AND a.attnum = ANY((i.indkey::int2[])[0:i.indnkeyatts - 1])) = %(columns)s::text[];
+"""
+
+
+# Adding the upsert key to tables created before it was enforced: as primary key, or as unique constraint
+# when the table already has a different primary key (e.g. a legacy id SERIAL). Rows that would violate
+# it (NULL keys, duplicates from loads without ON CONFLICT) are removed first
+def add_upsert_keys(cursor_object):
+    for table, columns in UPSERT_KEYS.items():
+        cursor_object.execute(UPSERT_KEY_INDEX_QUERY, {'table': table, 'columns': sorted(columns)})
+        if cursor_object.fetchone() is not None:
+            continue
+
+        cursor_object.execute(f"DELETE FROM {table} WHERE {' OR '.join(f'{column} IS NULL' for column in columns)};")
+        dropped_nulls = cursor_object.rowcount
+        cursor_object.execute(f"""
+            DELETE FROM {table} a USING {table} b
+            WHERE a.ctid > b.ctid AND {' AND '.join(f'a.{column} = b.{column}' for column in columns)};
+        """)
+        dropped_duplicates = cursor_object.rowcount
+
+        cursor_object.execute("SELECT 1 FROM pg_index WHERE indrelid = %s::regclass AND indisprimary;", (table,))
+        if cursor_object.fetchone() is None:
+            key = 'Primary key'
+            cursor_object.execute(f"ALTER TABLE {table} ADD PRIMARY KEY ({', '.join(columns)});")
+        else:
+            key = 'Unique constraint'
+            cursor_object.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_upsert_key UNIQUE ({', '.join(columns)});")
+        log_progress(f"{key} ({', '.join(columns)}) was added to {table}; removed {dropped_nulls} row(s) "
+                     f"with NULL keys and {dropped_duplicates} duplicate(s)")
+
+
+# Page ranges appended since the last summary are not covered by a BRIN index (every scan reads
+# them) until autovacuum gets to them, so loaders summarize right after a bulk insert
+def summarize_brin_index(cursor_object, table):
+    cursor_object.execute("SELECT brin_summarize_new_values(%s::regclass);", (BRIN_INDEXES[table],))
+    return cursor_object.fetchone()[0]
+
+
+# Ordered, append-only list of (version, description, SQL or callable taking a cursor).
+# Never edit an applied migration; add a new one instead
+MIGRATIONS = [
+    (1, 'base price and index tables', BASE_TABLES_DDL),
+    (2, 'compact company dimension and symbol ids', ensure_dimension_schema),
+    (3, 'article search vector and ticker mentions', ensure_article_schema),
+    (4, 'aggregate and load event tables', AGGREGATE_TABLES_DDL + OUTBOX_DDL),
+    (5, 'primary keys matching the upsert keys', add_upsert_keys),
+    (6, 'BRIN date indexes on the price tables', TIME_SERIES_INDEXES_DDL),
+    (7, 'upsert keys on tables with a different primary key', add_upsert_keys),
+    (8, 'sp500_stock_view with the stock symbols', STOCK_VIEW_DDL),
+]
+
+
+_schema_ready = False
+
+
+# Applying pending migrations once per process; loaders call this before writing
+def ensure_schema():
+    global _schema_ready
+    if _schema_ready:
+        return []
+
+    applied_now = []
+    with get_connection() as connection:
+        cursor_object = connection.cursor()
+        cursor_object.execute("SELECT pg_advisory_xact_lock(%s);", (SCHEMA_LOCK_ID,))
+        cursor_object.execute(SCHEMA_MIGRATIONS_DDL)
+        cursor_object.execute("SELECT version FROM schema_migrations;")
+        applied = {row[0] for row in cursor_object.fetchall()}
+
+        for version, description, migration in MIGRATIONS:
+            if version in applied:
+                continue
+            if callable(migration):
+                migration(cursor_object)
+            else:
+                cursor_object.execute(migration)
+            cursor_object.execute("INSERT INTO schema_migrations (version, description) VALUES (%s, %s);",
+                                  (version, description))
+            applied_now.append(version)
+            log_progress(f"Schema migration {version} ({description}) was applied")
+
+        connection.commit()
+        cursor_object.close()
+
+    _schema_ready = True
+    return applied_now
+
+
+def schema_status():
+    with get_connection() as connection:
+        cursor_object = connection.cursor()
+        cursor_object.execute(SCHEMA_MIGRATIONS_DDL)
+        cursor_object.execute("SELECT version, applied_at FROM schema_migrations;")
+        applied = dict(cursor_object.fetchall())
+        connection.commit()
+        cursor_object.close()
+    return [(version, description, applied.get(version)) for version, description, _ in MIGRATIONS]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Create or migrate the pipeline's PostgreSQL schema")
+    parser.add_argument('--status', action='store_true', help="Only list migrations and when they were applied")
+    args = parser.parse_args()
+
+    if not args.status:
+        print(f"Applied migrations: {ensure_schema() or 'none (schema is up to date)'}")
+    for version, description, applied_at in schema_status():
+        print(f"{version:>3}  {'applied ' + applied_at.isoformat() if applied_at else 'pending':<40} {description}")
@@ -0,0 +1,173 @@
+import os
+import heapq
+import logging
+import pandas as pd
+from dotenv import load_dotenv
+from pipeline.etl.db import get_connection
+from pipeline.etl.landing import get_landing_dir, to_partition_key
+from pipeline.etl.transform import transform_sp500_data, transform_sp500_stock_data
+from pipeline.etl.load import insert_sp500_company, insert_sp500_stock
+from pipeline.etl.aggregates import refresh_aggregates
+
+load_dotenv()
+
+
+# Setting up logging
+logger = logging.getLogger(__name__)
+
+
+# Setting up logging to log in the logs/ directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+log_file_path = os.path.join(current_dir, 'logs', 'code_log.txt')
+
+
+logging.basicConfig(
+    filename=log_file_path,  # Save the log file in logs/ directory
+    encoding='utf-8',
+    level=logging.DEBUG,
+    format='%(asctime)s: %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+
+def log_progress(message):
+    logger.debug(message)
+
+
+# Number of symbol shards the sp500 stock data is split into
+STOCK_SHARD_COUNT = int(os.getenv("STOCK_SHARD_COUNT", 8))
+
+# Per-run shard files under the landing zone, which must be shared by the workers running the shards
+SHARD_OUTPUT_DIR = '_stock_shards'
+
+# Rows stored for a shard's symbols within the date range of its source rows
+STORED_ROWS_QUERY = """
+SELECT count(*)
+FROM sp500_stock_table s
+JOIN symbol_lookup sym ON sym.symbol_id = s.symbol_id
+WHERE sym.name = ANY(%s) AND s.date BETWEEN %s AND %s;
+"""
+
+
+# Loading the company dimension that the stock shards resolve symbol ids and index weights against
+def load_sp500_company_data(sp500_file):
+    company_df = transform_sp500_data(sp500_file)
+    if company_df.empty:
+        raise ValueError(f"Transforming {sp500_file} produced no rows")
+    insert_sp500_company(company_df)
+
+
+# Splitting the symbols into at most shard_count shards of similar row counts: largest symbols first,
+# each to the currently lightest shard, so the mapped tasks finish at about the same time
+def assign_shards(rows_per_symbol, shard_count):
+    shard_count = max(1, min(int(shard_count), len(rows_per_symbol)))
+    shard_symbols = [[] for _ in range(shard_count)]
+    lightest = [(0, index) for index in range(shard_count)]
+    for symbol, rows in rows_per_symbol.items():
+        shard_rows, index = heapq.heappop(lightest)
+        shard_symbols[index].append(str(symbol))
+        heapq.heappush(lightest, (shard_rows + int(rows), index))
+    return [symbols for symbols in shard_symbols if symbols]
+
+
+# Parsing the source file once and writing each shard's rows to its own parquet file; returns one
+# entry per shard with its file and the number of distinct (symbol, date) rows it should end up with
+def plan_stock_shards(sp500_stock_file, shard_count=STOCK_SHARD_COUNT, run_date=None, landing_dir=None):
+    stock_df = pd.read_csv(rf"{sp500_stock_file}", dtype={'Symbol': 'category'})
+    keys_df = stock_df[['Date', 'Symbol']].dropna().drop_duplicates()
+    rows_per_symbol = keys_df['Symbol'].value_counts()
+    rows_per_symbol = rows_per_symbol[rows_per_symbol > 0]
+
+    output_dir = os.path.join(get_landing_dir(landing_dir), SHARD_OUTPUT_DIR, f"date={to_partition_key(run_date)}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    shards = []
+    for index, symbols in enumerate(assign_shards(rows_per_symbol, shard_count)):
+        shard_df = stock_df[stock_df['Symbol'].isin(symbols)].copy()
+        shard_df['Symbol'] = shard_df['Symbol'].astype(str)
+
+        output_path = os.path.join(output_dir, f"shard_{index}.parquet")
+        tmp_path = f"{output_path}.tmp"
+        shard_df.to_parquet(tmp_path, engine='pyarrow', compression='zstd', index=False)
+        os.replace(tmp_path, output_path)
+
+        shards.append({
+            'shard': index,
+            'path': output_path,
+            'symbols': symbols,
+            'expected_rows': int(rows_per_symbol[symbols].sum()),
+        })
+
+    log_progress(f"{len(rows_per_symbol)} symbols were split into {len(shards)} shard(s) under {output_dir}: "
+                 f"{[shard['expected_rows'] for shard in shards]} rows")
+    return shards
+
+
+# Transforming and loading the rows of one shard's symbols; returns the shard with its loaded row count and
+# dates, and the date range reconciliation checks. Aggregates are refreshed once by reconcile_stock_shards
+def transform_and_load_stock_shard(shard):
+    shard_df = transform_sp500_stock_data(shard['path'])
+    if shard_df.empty:
+        raise ValueError(f"Transforming stock shard {shard['shard']} produced no rows")
+
+    missing_dates = int(shard_df['date'].isna().sum())
+    if missing_dates:
+        log_progress(f"Stock shard {shard['shard']}: {missing_dates} row(s) without a date were dropped")
+        shard_df = shard_df.dropna(subset=['date'])
+
+    result = insert_sp500_stock(shard_df, update_aggregates=False)
+    if result is None:
+        raise RuntimeError(f"Loading stock shard {shard['shard']} ({len(shard_df)} rows) failed")
+    loaded_rows, loaded_dates = result
+
+    log_progress(f"Stock shard {shard['shard']}: {len(shard['symbols'])} symbols, {loaded_rows} new row(s)")
+    return {
+        **shard,
+        'loaded_rows': loaded_rows,
+        'loaded_dates': loaded_dates,
+        'min_date': str(shard_df['date'].min())[:10],
+        'max_date': str(shard_df['date'].max())[:10],
+    }
+
+
+# Checking that every shard's source rows are stored, then refreshing the aggregates once for the union of
+# the dates the shards inserted rows on. Raises if any shard is short, so the DAG run fails instead of
+# leaving partial data unnoticed; the shard files are removed once the run is reconciled
+def reconcile_stock_shards(shard_results):
+    shard_results = [result for result in shard_results if result]
+    report = []
+    with get_connection() as connection:
+        cursor_object = connection.cursor()
+
+        for result in sorted(shard_results, key=lambda item: item['shard']):
+            cursor_object.execute(STORED_ROWS_QUERY, (result['symbols'], result['min_date'], result['max_date']))
+            stored_rows = cursor_object.fetchone()[0]
+            report.append({
+                'shard': result['shard'],
+                'symbols': len(result['symbols']),
+                'expected_rows': result['expected_rows'],
+                'loaded_rows': result['loaded_rows'],
+                'stored_rows': stored_rows,
+            })
+            log_progress(f"Stock shard {result['shard']}: expected {result['expected_rows']}, "
+                         f"loaded {result['loaded_rows']} this run, stored {stored_rows}")
+
+        mismatched = [shard for shard in report if shard['stored_rows'] != shard['expected_rows']]
+        if mismatched:
+            raise ValueError(f"Row counts of {len(mismatched)} stock shard(s) do not match the source: {mismatched}")
+
+        loaded_dates = sorted({loaded_date for result in shard_results for loaded_date in result['loaded_dates']})
+        refreshed_dates = refresh_aggregates(cursor_object, loaded_dates)
+        connection.commit()
+        cursor_object.close()
+
+    for result in shard_results:
+        if os.path.exists(result['path']):
+            os.remove(result['path'])
+    shard_dirs = {os.path.dirname(result['path']) for result in shard_results}
+    for shard_dir in shard_dirs:
+        if os.path.isdir(shard_dir) and not os.listdir(shard_dir):
+            os.rmdir(shard_dir)
+
+    log_progress(f"{len(report)} stock shard(s) reconciled; aggregates refreshed for {len(refreshed_dates)} date(s)")
+    return report
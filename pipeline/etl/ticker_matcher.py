@@ -0,0 +1,99 @@
+import re
+from collections import deque
+
+
+# ASCII-only lower-casing keeps match offsets aligned with the original text
+ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+# Company-name suffixes dropped before matching names in headlines
+NAME_SUFFIXES = re.compile(
+    r"[\s,]+(inc\.?|incorporated|corp\.?|corporation|co\.?|company|plc|ltd\.?|limited|holdings?|group|"
+    r"n\.v\.|s\.a\.|the|class [a-c]|\(the\))$",
+    re.IGNORECASE
+)
+
+MIN_NAME_LENGTH = 4
+
+
+def clean_company_name(name):
+    name = str(name or '').strip()
+    previous = None
+    while previous != name:
+        previous = name
+        name = NAME_SUFFIXES.sub('', name).strip(' ,.')
+    return name
+
+
+# Aho-Corasick automaton over ticker symbols and company names; one pass over a headline finds every mention
+class TickerMatcher:
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.outputs = [[]]
+        self.built = False
+
+    # case_sensitive patterns (ticker symbols) must match the original casing exactly
+    def add_pattern(self, pattern, value, case_sensitive):
+        node = 0
+        for char in pattern.translate(ASCII_LOWER):
+            if char not in self.goto[node]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.outputs.append([])
+                self.goto[node][char] = len(self.goto) - 1
+            node = self.goto[node][char]
+        self.outputs[node].append((len(pattern), pattern, value, case_sensitive))
+        self.built = False
+
+    # Breadth-first pass setting failure links and merging outputs of suffix patterns
+    def build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.outputs[child] = self.outputs[child] + self.outputs[self.fail[child]]
+        self.built = True
+        return self
+
+    @classmethod
+    def from_companies(cls, companies):
+        matcher = cls()
+        for symbol, name, value in companies:
+            symbol = str(symbol or '').strip()
+            if symbol:
+                # One-letter tickers (A, C, F, T, V...) only count when written as $A
+                matcher.add_pattern(f"${symbol}", value, True)
+                if len(symbol) > 1:
+                    matcher.add_pattern(symbol, value, True)
+            name = clean_company_name(name)
+            if len(name) >= MIN_NAME_LENGTH:
+                matcher.add_pattern(name, value, False)
+        return matcher.build()
+
+    # Values of all patterns found as whole words in text
+    def find(self, text):
+        if not self.built:
+            self.build()
+        text = str(text or '')
+        folded = text.translate(ASCII_LOWER)
+        found = set()
+        node = 0
+        for end, char in enumerate(folded, start=1):
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            for length, pattern, value, case_sensitive in self.outputs[node]:
+                start = end - length
+                if case_sensitive and text[start:end] != pattern:
+                    continue
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                if end < len(text) and text[end].isalnum():
+                    continue
+                found.add(value)
+        return found
@@ -2,6 +2,7 @@ import os
 import pandas as pd
 import logging
 from dotenv import load_dotenv
+from pipeline.etl.landing import read_source
 
 load_dotenv()
 
@@ -28,12 +29,12 @@ def log_progress(message):
     logger.debug(message)
 
 
-# Transforming crypto.csv
-def process_crypto_data(crypto_file):
+# Transforming crypto.csv or the crypto landing partitions between start_date and end_date
+def process_crypto_data(crypto_file, start_date=None, end_date=None):
     crypto_df = None
     try:
-        # Reading the file and convert it to DataFrame
-        crypto_df = pd.read_csv(rf"{crypto_file}")
+        # Reading the file (or only the needed partitions) and convert it to DataFrame
+        crypto_df = read_source(crypto_file, 'crypto', start_date, end_date)
 
         # Melt the DataFrame
         crypto_df = pd.melt(
@@ -59,13 +60,15 @@ def process_crypto_data(crypto_file):
         # Drop 'success' column
         crypto_df = crypto_df.drop(columns=['success'])
 
-        # Reorder by descending date
-        crypto_df = crypto_df.sort_values(by='date', ascending=False)
+        # Daily return or percentage of change in 'rate', per currency. Rates are daily, so a return is only
+        # taken against the day before; across a gap in the data (or on the first date) it stays empty.
+        # insert_crypto recomputes the returns from the rates stored in crypto_table
+        crypto_df = crypto_df.dropna(subset=['rate']).sort_values(by=['currency', 'date'])
+        crypto_df['daily_return'] = crypto_df.groupby('currency')['rate'].pct_change()
+        previous_date = crypto_df.groupby('currency')['date'].shift()
+        crypto_df.loc[crypto_df['date'] - previous_date != pd.Timedelta(days=1), 'daily_return'] = None
 
-        # Daily return or percentage of change in 'rate'
-        crypto_df = crypto_df.sort_values(by='date')
-        crypto_df['daily_return'] = crypto_df['rate'].pct_change()  # Calculate percentage change
-        crypto_df = crypto_df.dropna()  # Drop the first row as there is no previous day to compare
+        crypto_df = crypto_df.sort_values(by=['date', 'currency'], ignore_index=True)
 
         log_progress(f"Success: Transformation completed")
 
@@ -138,11 +141,14 @@ def transform_sp500_index_data(sp500_index_file):
         return sp500_index_df
 
 
-# Transforming sp500_stocks.csv
+# Transforming sp500_stocks.csv, or one symbol shard of it split off as parquet
 def transform_sp500_stock_data(sp500_stock_file):
     sp500_stock_df = None
     try:
-        sp500_stock_df = pd.read_csv(rf"{sp500_stock_file}")
+        if str(sp500_stock_file).endswith('.parquet'):
+            sp500_stock_df = pd.read_parquet(sp500_stock_file, engine='pyarrow')
+        else:
+            sp500_stock_df = pd.read_csv(rf"{sp500_stock_file}")
 
         sp500_stock_df = sp500_stock_df.rename(columns={
             'Date': 'date',
@@ -219,17 +225,21 @@ def transform_mvr_data(mvr_file):
         return mastercard_df, visa_df
 
 
-# Transform scraped_articles.csv
-def transform_scraped_articles(scraped_articles_file):
+# Transform scraped_articles.csv or the articles landing partitions between start_date and end_date
+def transform_scraped_articles(scraped_articles_file, start_date=None, end_date=None):
     scraped_articles_df = None
     try:
-        scraped_articles_df = pd.read_csv(rf'{scraped_articles_file}')
+        scraped_articles_df = read_source(scraped_articles_file, 'articles', start_date, end_date)
 
         scraped_articles_df = scraped_articles_df.rename(columns={
             'Title': 'title',
             'Link': 'link'
         })
 
+        # The same headline is scraped on consecutive runs; keep one row per link
+        scraped_articles_df = scraped_articles_df[['title', 'link']].dropna(subset=['link'])
+        scraped_articles_df = scraped_articles_df.drop_duplicates(subset='link', keep='first')
+
         log_progress(f"Success: Transformation completed")
 
     except Exception as e:
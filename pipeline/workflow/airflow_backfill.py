@@ -0,0 +1,72 @@
+from airflow import DAG
+from airflow.models.param import Param
+from airflow.operators.python import PythonOperator
+from datetime import datetime, timedelta
+import os
+from dotenv import load_dotenv
+
+# Import backfill steps
+from pipeline.etl.backfill import (
+    plan_shards,
+    fetch_and_transform_shard,
+    merge_and_load
+)
+from pipeline.etl.profiling import profile_stage
+
+# Load environment variables
+load_dotenv()
+
+# Landing zone holding the fetched crypto partitions and the transformed shards. Shard and merge tasks
+# can run on different workers, so it must be on storage shared by all of them
+landing_dir = os.getenv("LANDING_DATA_DIR")
+
+# Upper bound on shards fetched/transformed at the same time across the worker pool
+max_concurrent_shards = int(os.getenv("BACKFILL_MAX_CONCURRENCY", 4))
+
+# DAG default arguments
+default_args = {
+    'owner': 'Hau_Nguyen',
+    'depends_on_past': False,
+    'start_date': datetime(2024, 10, 31),
+    'retries': 3,
+    'retry_delay': timedelta(minutes=5),
+}
+
+# Define the DAG (triggered manually with a date range, e.g. from the UI or `airflow dags trigger --conf`)
+with DAG(
+    'crypto_backfill',
+    default_args=default_args,
+    description='Sharded historical backfill of crypto_table',
+    schedule_interval=None,
+    catchup=False,
+    params={
+        'start_date': Param(type='string', format='date'),
+        'end_date': Param(type='string', format='date'),
+        'shards': Param(16, type='integer', minimum=1),
+    },
+) as dag:
+
+    # Dates already loaded are skipped, so reruns only work on what is missing
+    plan_task = PythonOperator(
+        task_id='plan_backfill_shards',
+        python_callable=profile_stage(plan_shards),
+        op_kwargs={'start_date': '{{ params.start_date }}', 'end_date': '{{ params.end_date }}',
+                   'shard_count': '{{ params.shards }}'},
+    )
+
+    # One mapped task instance per shard
+    shard_task = PythonOperator.partial(
+        task_id='fetch_and_transform_shard',
+        python_callable=profile_stage(fetch_and_transform_shard),
+        op_kwargs={'landing_dir': landing_dir},
+        max_active_tis_per_dag=max_concurrent_shards,
+    ).expand(op_args=plan_task.output.map(lambda shard_dates: [shard_dates]))
+
+    # Single bulk load of all transformed shards
+    load_task = PythonOperator(
+        task_id='merge_and_load_backfill',
+        python_callable=profile_stage(merge_and_load),
+        op_kwargs={'shard_paths': shard_task.output},
+    )
+
+    plan_task >> shard_task >> load_task
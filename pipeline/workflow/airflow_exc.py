@@ -11,46 +11,60 @@ from pipeline.etl.extract import (
 )
 from pipeline.etl.transform import (
     process_crypto_data,
-    transform_sp500_data,
     transform_sp500_index_data,
-    transform_sp500_stock_data,
     transform_mvr_data,
     transform_scraped_articles
 )
+from pipeline.etl.landing import get_landing_dir
+from pipeline.etl.profiling import profile_stage
 from pipeline.etl.load import (
-    insert_sp500_company,
     insert_sp500_index,
     insert_crypto,
-    insert_sp500_stock,
     insert_articles,
     insert_mastercard_stock,
     insert_visa_stock
 )
+from pipeline.etl.stock_shards import (
+    STOCK_SHARD_COUNT,
+    load_sp500_company_data,
+    plan_stock_shards,
+    transform_and_load_stock_shard,
+    reconcile_stock_shards
+)
 
 # Load environment variables
 load_dotenv()
 
+# Landing zone written by the extract tasks (dataset=<name>/date=YYYY-MM-DD/part.parquet) and read by
+# the crypto and articles transforms; LANDING_DATA_DIR or the default directory
+landing_dir = get_landing_dir()
+
 # File paths from environment variables
-crypto_data_file = os.getenv("CRYPTO_FILEPATH")
+crypto_data_file = landing_dir
 mvr_data_file = os.getenv("MVR_FILEPATH")
 sp500_data_file = os.getenv("SP500_FILEPATH")
 sp500_index_data_file = os.getenv("SP500_INDEX_FILEPATH")
 sp500_stocks_data_file = os.getenv("SP500_STOCKS_FILEPATH")
-scraped_articles_data_file = os.getenv("SCRAPED_ARTICLES_FILEPATH")
+scraped_articles_data_file = landing_dir
 
 # Directory to save transformed files
 transformed_dir = os.getenv("TRANSFORMED_DATA_DIR")
 
+# Upper bound on sp500 stock shards transformed/loaded at the same time across the worker pool
+max_concurrent_stock_shards = int(os.getenv("STOCK_SHARD_MAX_CONCURRENCY", STOCK_SHARD_COUNT))
+
 # DAG default arguments
 default_args = {
     'owner': 'Hau_Nguyen',
     'depends_on_past': False,
     'start_date': datetime(2024, 10, 31),
+    'retries': 3,  # Extract tasks raise on API/scraping failures, so these retries actually fire
     'retry_delay': timedelta(minutes=5),
     'catchup': False
 }
 
-# Define the DAG
+# Define the DAG. Callables are wrapped with profile_stage, which returns them unchanged
+# unless PIPELINE_PROFILE is set in the worker environment
 with DAG(
     'finance_etl_pipeline',
     default_args=default_args,
@@ -60,102 +74,109 @@ with DAG(
 
     # Paths for transformed data
     transformed_crypto_file = os.path.join(transformed_dir, "crypto_transformed.csv")
-    transformed_sp500_file = os.path.join(transformed_dir, "sp500_transformed.csv")
     transformed_sp500_index_file = os.path.join(transformed_dir, "sp500_index_transformed.csv")
-    transformed_sp500_stocks_file = os.path.join(transformed_dir, "sp500_stocks_transformed.csv")
     transformed_mvr_file = os.path.join(transformed_dir, "mvr_transformed.csv")
     transformed_articles_file = os.path.join(transformed_dir, "articles_transformed.csv")
 
     # Extract Tasks
     crypto_extract_task = PythonOperator(
         task_id='extract_crypto_data',
-        python_callable=fetch_data_from_api,
-        op_kwargs={'api_endpoint': os.getenv('CRYPTO_API_ENDPOINT')},
+        python_callable=profile_stage(fetch_data_from_api),
+        op_kwargs={'api_endpoint': os.getenv('CRYPTO_API_ENDPOINT'), 'landing_dir': landing_dir,
+                   'partition_date': '{{ ds }}'},
     )
 
     scraping_article_task = PythonOperator(
         task_id='extract_articles',
-        python_callable=scraping_websites,
-        op_kwargs={'articles_link': os.getenv('ARTICLES_LINK')},
+        python_callable=profile_stage(scraping_websites),
+        op_kwargs={'url_link': os.getenv('ARTICLES_LINK'), 'landing_dir': landing_dir,
+                   'partition_date': '{{ ds }}'},
     )
 
     # Transformation Tasks
     transform_crypto_task = PythonOperator(
         task_id='process_crypto_data',
-        python_callable=process_crypto_data,
-        op_kwargs={'crypto_file': crypto_data_file, 'output_file': transformed_crypto_file},
-    )
-
-    transform_sp500_comp_task = PythonOperator(
-        task_id='process_sp500_data',
-        python_callable=transform_sp500_data,
-        op_kwargs={'sp500_file': sp500_data_file, 'output_file': transformed_sp500_file},
+        python_callable=profile_stage(process_crypto_data),
+        op_kwargs={'crypto_file': crypto_data_file, 'start_date': '{{ ds }}', 'end_date': '{{ ds }}'},
     )
 
     transform_sp500_index_task = PythonOperator(
         task_id='process_sp500_index_data',
-        python_callable=transform_sp500_index_data,
+        python_callable=profile_stage(transform_sp500_index_data),
         op_kwargs={'sp500_index_file': sp500_index_data_file, 'output_file': transformed_sp500_index_file},
     )
 
-    transform_sp500_stock_task = PythonOperator(
-        task_id='process_sp500_stock_data',
-        python_callable=transform_sp500_stock_data,
-        op_kwargs={'sp500_stocks_file': sp500_stocks_data_file, 'output_file': transformed_sp500_stocks_file},
-    )
-
     transform_mvr_task = PythonOperator(
         task_id='process_mvr_data',
-        python_callable=transform_mvr_data,
+        python_callable=profile_stage(transform_mvr_data),
         op_kwargs={'mvr_file': mvr_data_file, 'output_file': transformed_mvr_file},
     )
 
     transform_scraped_article = PythonOperator(
         task_id='process_scraped_articles',
-        python_callable=transform_scraped_articles,
-        op_kwargs={'scraped_articles_file': scraped_articles_data_file, 'output_file': transformed_articles_file},
+        python_callable=profile_stage(transform_scraped_articles),
+        op_kwargs={'scraped_articles_file': scraped_articles_data_file,
+                   'start_date': '{{ ds }}', 'end_date': '{{ ds }}'},
     )
 
     # Load Task
     load_crypto_task = PythonOperator(
         task_id='load_crypto_data',
-        python_callable=insert_crypto,
+        python_callable=profile_stage(insert_crypto),
         op_kwargs={'crypto_file': transformed_crypto_file},
     )
 
+    # Transforms and loads the company dimension in one task (stock shards resolve symbols against it)
     load_sp500_company_task = PythonOperator(
         task_id='load_sp500_company_data',
-        python_callable=insert_sp500_company,
-        op_kwargs={'sp500_file': transformed_sp500_file},
+        python_callable=profile_stage(load_sp500_company_data),
+        op_kwargs={'sp500_file': sp500_data_file},
     )
 
     load_sp500_index_task = PythonOperator(
         task_id='load_sp500_index_data',
-        python_callable=insert_sp500_index,
+        python_callable=profile_stage(insert_sp500_index),
         op_kwargs={'sp500_index_file': transformed_sp500_index_file},
     )
 
-    load_sp500_stock_task = PythonOperator(
-        task_id='load_sp500_stock_data',
-        python_callable=insert_sp500_stock,
-        op_kwargs={'sp500_stocks_file': transformed_sp500_stocks_file},
+    # S&P 500 stock data: the source file is parsed once and split into per-shard parquet files of
+    # similar row counts in the landing zone (shared by the workers)
+    plan_sp500_stock_task = PythonOperator(
+        task_id='plan_sp500_stock_shards',
+        python_callable=profile_stage(plan_stock_shards),
+        op_kwargs={'sp500_stock_file': sp500_stocks_data_file, 'shard_count': STOCK_SHARD_COUNT,
+                   'run_date': '{{ ds }}', 'landing_dir': landing_dir},
+    )
+
+    # One mapped task instance per shard, each transforming and loading only its own file
+    sp500_stock_shard_task = PythonOperator.partial(
+        task_id='transform_and_load_sp500_stock_shard',
+        python_callable=profile_stage(transform_and_load_stock_shard),
+        max_active_tis_per_dag=max_concurrent_stock_shards,
+    ).expand(op_args=plan_sp500_stock_task.output.map(lambda shard: [shard]))
+
+    # Fails the run if any shard's stored rows differ from its source rows; refreshes the aggregates once
+    reconcile_sp500_stock_task = PythonOperator(
+        task_id='reconcile_sp500_stock_shards',
+        python_callable=profile_stage(reconcile_stock_shards),
+        op_kwargs={'shard_results': sp500_stock_shard_task.output},
     )
 
     load_mvr_mastercard_task = PythonOperator(
         task_id='load_mastercard_data',
-        python_callable=insert_mastercard_stock,
+        python_callable=profile_stage(insert_mastercard_stock),
         op_kwargs={'mvr_file': transformed_mvr_file},
     )
 
     load_mvr_visa_task = PythonOperator(
         task_id='load_visa_data',
-        python_callable=insert_visa_stock,
+        python_callable=profile_stage(insert_visa_stock),
         op_kwargs={'mvr_file': transformed_mvr_file},
     )
 
     load_scraped_articles_task = PythonOperator(
         task_id='load_scraped_articles',
-        python_callable=insert_articles,
+        python_callable=profile_stage(insert_articles),
         op_kwargs={'scraped_articles_file': transformed_articles_file},
     )
 
@@ -167,14 +188,21 @@ with DAG(
     # Extract -> Transform -> Load for scraped articles
     scraping_article_task >> transform_scraped_article >> load_scraped_articles_task
 
-    # S&P 500 company data
-    transform_sp500_comp_task >> load_sp500_company_task
-
     # S&P 500 index data
     transform_sp500_index_task >> load_sp500_index_task
 
-    # S&P 500 stock data
-    transform_sp500_stock_task >> load_sp500_stock_task
+    # S&P 500 company and stock data (shards map symbols to ids and aggregates join the company weights,
+    # so companies load first)
+    load_sp500_company_task >> plan_sp500_stock_task >> sp500_stock_shard_task >> reconcile_sp500_stock_task
 
     # MVR (Mastercard and Visa stock data)
     transform_mvr_task >> [load_mvr_mastercard_task, load_mvr_visa_task]
+
+
+# Local run of a single DAG run in one process (no scheduler needed), against the database in .env.
+# An optional task_id regex limits it to the matching tasks and their upstream tasks:
+# python -m pipeline.workflow.airflow_exc [sp500_stock]
+if __name__ == '__main__':
+    import sys
+    test_dag = dag.partial_subset(sys.argv[1], include_upstream=True) if len(sys.argv) > 1 else dag
+    test_dag.test()
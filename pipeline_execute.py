@@ -1,5 +1,7 @@
 import os
+import argparse
 import logging
+from datetime import date
 from dotenv import load_dotenv
 
 
@@ -14,6 +16,8 @@ from pipeline.etl.transform import (
     transform_mvr_data,
     transform_scraped_articles
 )
+from pipeline.etl.landing import get_landing_dir
+from pipeline.etl.profiling import profile_stage, enable_profiling, PROFILE_MODES
 from pipeline.etl.load import (
     insert_crypto,
     insert_articles,
@@ -50,12 +54,13 @@ def log_progress(message):
 
 
 # Fetching and storing data as files in created directory
-def extracted_data():
+def extracted_data(run_date=None):
     crypto_api = os.getenv("CRYPTO_API_ENDPOINT")
     article_url = os.getenv("ARTICLES_LINK")
+    landing_dir = get_landing_dir()
 
-    retrieve_and_store_data = (fetch_data_from_api(crypto_api),
-                               scraping_websites(article_url))
+    retrieve_and_store_data = (profile_stage(fetch_data_from_api)(crypto_api, landing_dir, run_date),
+                               profile_stage(scraping_websites)(article_url, landing_dir, run_date))
 
     log_progress("Completed extracting data")
 
@@ -65,32 +70,49 @@ def extracted_data():
 log_progress("Extract data completed successfully. Initializing transformation and loading process...")
 
 
-# Transforming raw data files and load them into
-def processed_and_load_data():
-    article_data_file = os.getenv("SCRAPED_ARTICLES_FILEPATH")
-    crypto_data_file = os.getenv("CRYPTO_FILEPATH")
+# Transforming raw data files and load them into PostgreSQL.
+# Every stage call goes through profile_stage, which is a no-op unless PIPELINE_PROFILE / --profile is set
+def processed_and_load_data(run_date=None):
+    run_date = run_date or date.today().isoformat()
+
+    # Crypto and articles are read from the landing zone the extract wrote to, pruned to this run's partition
+    article_data_file = crypto_data_file = get_landing_dir()
     mvr_data_file = os.getenv("MRV_FILEPATH")
     sp500_data_file = os.getenv("SP500_FILEPATH")
     sp500_index_data_file = os.getenv("SP500_INDEX_FILEPATH")
     sp500_stocks_data_file = os.getenv("SP500_STOCKS_FILEPATH")
 
-    crypto_df = process_crypto_data(crypto_data_file)
-    insert_crypto(crypto_df)
+    crypto_df = profile_stage(process_crypto_data)(crypto_data_file, run_date, run_date)
+    profile_stage(insert_crypto)(crypto_df)
 
-    sp500_df = transform_sp500_data(sp500_data_file)
-    insert_sp500_company(sp500_df)
+    sp500_df = profile_stage(transform_sp500_data)(sp500_data_file)
+    profile_stage(insert_sp500_company)(sp500_df)
 
-    sp500_stock_df = transform_sp500_stock_data(sp500_stocks_data_file)
-    insert_sp500_stock(sp500_stock_df)
+    sp500_stock_df = profile_stage(transform_sp500_stock_data)(sp500_stocks_data_file)
+    profile_stage(insert_sp500_stock)(sp500_stock_df)
 
-    sp500_index_df = transform_sp500_index_data(sp500_index_data_file)
-    insert_sp500_index(sp500_index_df)
+    sp500_index_df = profile_stage(transform_sp500_index_data)(sp500_index_data_file)
+    profile_stage(insert_sp500_index)(sp500_index_df)
 
-    mastercard_df, visa_df = transform_mvr_data(mvr_data_file)
-    insert_visa_stock(visa_df)
-    insert_mastercard_stock(mastercard_df)
+    mastercard_df, visa_df = profile_stage(transform_mvr_data)(mvr_data_file)
+    profile_stage(insert_visa_stock)(visa_df)
+    profile_stage(insert_mastercard_stock)(mastercard_df)
 
-    scraped_articles_df = transform_scraped_articles(article_data_file)
-    insert_articles(scraped_articles_df)
+    scraped_articles_df = profile_stage(transform_scraped_articles)(article_data_file, run_date, run_date)
+    profile_stage(insert_articles)(scraped_articles_df)
 
     log_progress("Transform and load data into PostgreSQL completed successfully")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the financial ETL pipeline")
+    parser.add_argument('--run-date', help="Landing partition to extract into and transform (YYYY-MM-DD)")
+    parser.add_argument('--profile', nargs='?', const='all', choices=PROFILE_MODES,
+                        help="Write per-stage cProfile/sampled-stack/tracemalloc reports to logs/profiles")
+    args = parser.parse_args()
+
+    if args.profile:
+        enable_profiling(args.profile)
+
+    extracted_data(args.run_date)
+    processed_and_load_data(args.run_date)